@@ -0,0 +1,155 @@
+# backend/app/services/admission.py
+import math
+import threading
+import time
+from collections import OrderedDict
+from .metrics import record_admission
+
+class AdmissionRejected(Exception):
+    """Raised when a request is turned away; status_code is 429 (client over its rate) or 503 (server overloaded)"""
+
+    def __init__(self, status_code, reason, retry_after):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Allows rate tokens per second on average, with bursts of up to burst tokens"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated_at")
+
+    def __init__(self, rate, burst, now=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic() if now is None else now
+
+    def take(self, cost, now):
+        """Take cost tokens, returning 0 if they were available, else the seconds until they will be"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def refund(self, cost):
+        self.tokens = min(self.burst, self.tokens + cost)
+
+class _Ticket:
+    """An admitted request; releases its in-flight slot when the block exits"""
+
+    __slots__ = ("controller",)
+
+    def __init__(self, controller):
+        self.controller = controller
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+        return False
+
+    def release(self):
+        """Release the slot now; later calls do nothing"""
+        if self.controller is not None:
+            self.controller._release()
+            self.controller = None
+
+class AdmissionController:
+    """Per-client and global token buckets plus a cap on in-flight analyses.
+
+    A limit of 0 disables it. Requests are rejected immediately rather than
+    queued, so an overloaded server answers fast instead of slowly for
+    everyone. When more than degrade_at analyses are in flight,
+    on_degraded(True) is called so cheaper features can be used until the
+    load drops again.
+    """
+
+    def __init__(self, client_rate=0, client_burst=20, global_rate=0, global_burst=100,
+                 max_in_flight=0, degrade_at=0, retry_after=1, max_clients=10_000, on_degraded=None):
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_in_flight = max_in_flight
+        self.degrade_at = degrade_at
+        self.retry_after = retry_after
+        self.max_clients = max_clients
+        self.on_degraded = on_degraded
+        self.global_bucket = TokenBucket(global_rate, global_burst) if global_rate > 0 else None
+        self.in_flight = 0
+        self.degraded = False
+        # Least recently seen clients are dropped first; a dropped client starts with a full bucket
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def admit(self, client, cost=1):
+        """Admit a request costing cost tokens, returning a ticket to use as a context manager"""
+        with self._lock:
+            now = time.monotonic()
+            client_bucket = self._client_bucket(client, now)
+            if client_bucket is not None:
+                # A batch larger than the burst could never be admitted otherwise
+                client_cost = min(cost, client_bucket.burst)
+                wait = client_bucket.take(client_cost, now)
+                if wait:
+                    self._reject(429, "client_rate", f"Rate limit exceeded for {client}", wait)
+
+            if self.global_bucket is not None:
+                global_cost = min(cost, self.global_bucket.burst)
+                wait = self.global_bucket.take(global_cost, now)
+                if wait:
+                    if client_bucket is not None:
+                        client_bucket.refund(client_cost)
+                    self._reject(503, "global_rate", "Server is over its request rate", wait)
+
+            if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                if client_bucket is not None:
+                    client_bucket.refund(client_cost)
+                if self.global_bucket is not None:
+                    self.global_bucket.refund(global_cost)
+                self._reject(503, "concurrency", f"Too many analyses in progress ({self.in_flight})", self.retry_after)
+
+            self.in_flight += 1
+            self._update_degraded()
+        record_admission("admitted", self.in_flight, self.degraded)
+        return _Ticket(self)
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "degraded": self.degraded,
+            "tracked_clients": len(self._clients),
+            "global_tokens": round(self.global_bucket.tokens, 2) if self.global_bucket is not None else None
+        }
+
+    def _client_bucket(self, client, now):
+        if self.client_rate <= 0:
+            return None
+        bucket = self._clients.get(client)
+        if bucket is None:
+            bucket = self._clients[client] = TokenBucket(self.client_rate, self.client_burst, now)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(client)
+        return bucket
+
+    def _reject(self, status_code, reason, detail, wait):
+        record_admission(reason, self.in_flight, self.degraded)
+        raise AdmissionRejected(status_code, detail, max(1, math.ceil(wait)))
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._update_degraded()
+        record_admission(None, self.in_flight, self.degraded)
+
+    def _update_degraded(self):
+        degraded = bool(self.degrade_at) and self.in_flight > self.degrade_at
+        if degraded != self.degraded:
+            self.degraded = degraded
+            if self.on_degraded is not None:
+                self.on_degraded(degraded)
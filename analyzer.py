@@ -1,121 +1,350 @@
-# backend/app/services/analyzer.py
-from datetime import datetime
-from .email_processor import EmailProcessor
-from .ml_classifier import FraudClassifier
-from ..models.email_model import Email, FraudIndicator
-from sqlalchemy.orm import Session
-
-class EmailAnalyzer:
-    def __init__(self, model_path=None):
-        self.processor = EmailProcessor()
-        self.classifier = FraudClassifier(model_path)
-        
-    async def analyze_email(self, raw_email, db: Session, user_id: int = None):
-        """Analyze an email and save results to database"""
-        # Parse the email
-        parsed_email = self.processor.parse_email(raw_email)
-        
-        # Get prediction
-        prediction = self.classifier.predict(parsed_email)
-        
-        # Create database entry
-        if user_id is not None:
-            email_record = Email(
-                user_id=user_id,
-                sender=parsed_email["headers"]["from"],
-                subject=parsed_email["headers"]["subject"],
-                body=parsed_email["body"],
-                received_date=datetime.now(),  # Or parse the actual date from headers
-                analyzed=True,
-                fraud_score=prediction["fraud_probability"],
-                is_fraud=prediction["is_fraud"],
-                analysis_date=datetime.now()
-            )
-            db.add(email_record)
-            db.commit()
-            db.refresh(email_record)
-            
-            # Add indicators
-            for indicator in prediction["indicators"]:
-                db_indicator = FraudIndicator(
-                    email_id=email_record.id,
-                    indicator_type=indicator["type"],
-                    description=indicator["description"],
-                    severity=indicator["severity"],
-                    evidence=None  # Could add specific evidence in a real system
-                )
-                db.add(db_indicator)
-            
-            db.commit()
-            
-            return {
-                "id": email_record.id,
-                "analysis": prediction,
-                "email_data": {
-                    "sender": parsed_email["headers"]["from"],
-                    "subject": parsed_email["headers"]["subject"],
-                    "date": parsed_email["headers"]["date"]
-                }
-            }
-        else:
-            # Just return analysis without saving to database
-            return {
-                "id": None,
-                "analysis": prediction,
-                "email_data": {
-                    "sender": parsed_email["headers"]["from"],
-                    "subject": parsed_email["headers"]["subject"],
-                    "date": parsed_email["headers"]["date"]
-                }
-            }
-    
-    async def analyze_text(self, email_content):
-        """Analyze email content provided as text"""
-        # Convert text to raw email format
-        # This is simplified - a real implementation would create proper email structure
-        raw_email = f"""
-From: unknown@example.com
-To: user@example.com
-Subject: {email_content[:50]}
-Date: {datetime.now().strftime('%a, %d %b %Y %H:%M:%S +0000')}
-Content-Type: text/plain
-
-{email_content}
-"""
-        # Parse the email
-        parsed_email = self.processor.parse_email(raw_email.encode())
-        
-        # Get prediction
-        prediction = self.classifier.predict(parsed_email)
-        
-        return {
-            "analysis": prediction,
-            "email_data": {
-                "text": email_content[:100] + "..." if len(email_content) > 100 else email_content
-            }
-        }
-    
-    def provide_feedback(self, email_id, is_fraud, db: Session):
-        """Update model based on user feedback"""
-        email = db.query(Email).filter(Email.id == email_id).first()
-        if not email:
-            return {"success": False, "message": "Email not found"}
-        
-        # Parse the stored email
-        raw_email = f"""
-From: {email.sender}
-Subject: {email.subject}
-Content-Type: text/plain
-
-{email.body}
-"""
-        parsed_email = self.processor.parse_email(raw_email.encode())
-        
-        # Update the model
-        self.classifier.update_model(parsed_email, is_fraud)
-        
-        # Update the database
-        email.is_fraud = is_fraud
-        db.commit()
-        
-        return {"success": True, "message": "Feedback recorded"}
+# backend/app/services/analyzer.py
+import asyncio
+import logging
+import os
+import resource
+import time
+from datetime import datetime
+from .campaign_index import CampaignIndex, refresh_campaign_index
+from .email_document import EmailDocument
+from .email_processor import get_processor
+from .executor import AnalysisExecutor
+from .metrics import record_prediction, timed
+from .ml_classifier import FraudClassifier
+from .result_cache import ResultCache, content_key
+from .sender_cache import NO_SENDER_FEATURES, PLACEHOLDER_SENDER
+from .persistence import WriteBehindQueue, build_record, save_records_async
+from .retraining import RetrainingJob
+from .tiered import build_scorer
+from .user_stats import feedback_stat_rows, upsert_stats_statement
+from ..database import create_async_session, create_session
+from ..models.email_model import Email, FeedbackSample
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+def build_stored_raw_email(sender, subject, body, authentication_results=None):
+    """Rebuild a raw email from the fields kept in the emails table"""
+    auth_headers = "".join(
+        f"Authentication-Results: {' '.join(value.split())}\n" for value in authentication_results or []
+    )
+    raw_email = f"""From: {sender}
+{auth_headers}Subject: {" ".join((subject or "").split())}
+Content-Type: text/plain
+
+{body}
+"""
+    return raw_email.encode()
+
+def stored_sender_features(processor, sender_features, parsed_email):
+    """Sender features saved at analysis time, or the domain age alone for emails saved without them"""
+    if sender_features is not None:
+        return sender_features
+    if processor.sender_cache is None:
+        return dict(NO_SENDER_FEATURES)
+    return processor.sender_cache.features(parsed_email["sender_domain"], with_history=False)
+
+class EmailAnalyzer:
+    def __init__(self, model_path=None):
+        # Analyzer and classifier share one processor (and one spaCy pipeline)
+        self.processor = get_processor()
+        self.classifier = FraudClassifier(model_path, processor=self.processor)
+        
+        # Cheap rule tiers in front of the model, when enabled
+        self.scorer = build_scorer(self.classifier, self.processor)
+        
+        # Parsing and scoring run on the configured backend so they don't block the event loop
+        self.executor = AnalysisExecutor(
+            self.processor,
+            self.scorer,
+            backend=settings.ANALYSIS_BACKEND,
+            pool_size=settings.ANALYSIS_POOL_SIZE,
+            queue_depth=settings.ANALYSIS_QUEUE_DEPTH,
+            model_path=model_path
+        )
+        
+        # Sender history is queried here, before scoring, so the executor never waits on the database
+        sender_cache = self.processor.sender_cache
+        self.sender_history = sender_cache is not None and sender_cache.history_loader is not None
+        
+        # Identical campaign emails are scored once per model version
+        self.cache = None
+        if settings.RESULT_CACHE_SIZE > 0:
+            self.cache = ResultCache(settings.RESULT_CACHE_SIZE, settings.RESULT_CACHE_TTL_SECONDS)
+        
+        # Near-duplicates of emails with a confirmed verdict inherit it without being scored
+        self.campaigns = None
+        if settings.CAMPAIGN_INDEX_ENABLED:
+            self.campaigns = CampaignIndex(threshold=settings.CAMPAIGN_MATCH_THRESHOLD)
+        
+        # Optionally persist results in the background so responses don't wait on the database
+        self.write_behind = None
+        if settings.WRITE_BEHIND_ENABLED:
+            self.write_behind = WriteBehindQueue(
+                create_session,
+                batch_size=settings.WRITE_BEHIND_BATCH_SIZE,
+                flush_interval=settings.WRITE_BEHIND_FLUSH_SECONDS
+            )
+        
+        # Feedback is buffered in the database and the model is retrained from it periodically
+        self.retraining = RetrainingJob(
+            self.classifier,
+            self.executor,
+            create_async_session,
+            min_samples=settings.RETRAIN_MIN_SAMPLES,
+            max_interval_seconds=settings.RETRAIN_MAX_INTERVAL_SECONDS,
+            check_seconds=settings.RETRAIN_CHECK_SECONDS,
+            n_jobs=settings.RETRAIN_N_JOBS
+        )
+        
+    def warm_up(self):
+        """Load the NLP pipeline and run one email through feature extraction"""
+        start = time.perf_counter()
+        parsed_email = self.processor.parse_email(self._build_raw_email("Warm up"))
+        self.processor.extract_features(parsed_email)
+        stats = {
+            "warm_up_seconds": round(time.perf_counter() - start, 3),
+            # ru_maxrss is reported in kilobytes on Linux
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        }
+        logger.info("Analyzer warmed up in %ss (peak RSS %s MB)", stats["warm_up_seconds"], stats["peak_rss_mb"])
+        return stats
+        
+    async def analyze_email(self, raw_email, db: AsyncSession, user_id: int = None):
+        """Analyze an email (raw bytes or a parsed message) and save results to database"""
+        # Parse the email and get prediction
+        parsed_email, prediction = await self._score(raw_email)
+        record_prediction(prediction)
+        
+        # Create database entry
+        email_id = None
+        if user_id is not None:
+            with timed("db_write"):
+                email_id = await self._save(db, build_record(user_id, parsed_email, prediction))
+            self._index_campaign(email_id, parsed_email)
+        
+        return {
+            "id": email_id,
+            "analysis": prediction,
+            "email_data": {
+                "sender": parsed_email["headers"]["from"],
+                "subject": parsed_email["headers"]["subject"],
+                "date": parsed_email["headers"]["date"],
+                "truncated": parsed_email["truncated"]
+            }
+        }
+    
+    async def analyze_text(self, email_content):
+        """Analyze email content provided as text"""
+        # Parse the email and get prediction
+        _, prediction = await self._score(self._build_raw_email(email_content))
+        record_prediction(prediction)
+        
+        return {
+            "analysis": prediction,
+            "email_data": self._text_preview(email_content)
+        }
+    
+    async def analyze_batch(self, email_contents, db: AsyncSession = None, user_id: int = None):
+        """Analyze many emails provided as text with a single model call"""
+        raw_emails = [self._build_raw_email(email_content) for email_content in email_contents]
+        
+        # Score the whole batch at once
+        if self.campaigns is None and not self.sender_history:
+            scored = await self.executor.score_batch(raw_emails)
+        else:
+            scored = await self._score_batch(raw_emails)
+        for _, prediction in scored:
+            record_prediction(prediction)
+        
+        # Write every email and indicator in one transaction
+        email_ids = [None] * len(scored)
+        if user_id is not None:
+            with timed("db_write"):
+                email_ids = await save_records_async(db, [
+                    build_record(user_id, parsed_email, prediction)
+                    for parsed_email, prediction in scored
+                ])
+            for email_id, (parsed_email, _) in zip(email_ids, scored):
+                self._index_campaign(email_id, parsed_email)
+        
+        return [
+            {
+                "id": email_id,
+                "analysis": prediction,
+                "email_data": self._text_preview(email_content)
+            }
+            for email_content, email_id, (_, prediction) in zip(email_contents, email_ids, scored)
+        ]
+    
+    def reload_reputation(self):
+        """Re-read the domain blocklists and drop results scored with the old ones"""
+        stats = self.processor.reputation.reload()
+        if self.cache is not None:
+            self.cache.clear()
+        # Process workers build their own index from the files on start
+        self.executor.restart()
+        return stats
+    
+    async def load_campaigns(self):
+        """Restore the campaign index from its snapshot and add emails and feedback stored since"""
+        if self.campaigns is None:
+            return None
+        
+        path = settings.CAMPAIGN_INDEX_PATH
+        if path and os.path.exists(path):
+            try:
+                self.campaigns = await asyncio.to_thread(CampaignIndex.load, path, settings.CAMPAIGN_MATCH_THRESHOLD)
+            except (OSError, ValueError, KeyError):
+                logger.exception("Could not load campaign index snapshot %s; rebuilding it from the database", path)
+        
+        async with create_async_session() as db:
+            counts = await refresh_campaign_index(self.campaigns, db)
+        logger.info("Campaign index loaded: %d emails added, %d verdicts confirmed", counts["added"], counts["confirmed"])
+        return counts
+    
+    def save_campaigns(self):
+        """Snapshot the campaign index for the next startup"""
+        if self.campaigns is not None and settings.CAMPAIGN_INDEX_PATH:
+            self.campaigns.save(settings.CAMPAIGN_INDEX_PATH)
+    
+    async def _score(self, raw_email):
+        """Parse and score an email, reusing a confirmed campaign verdict or the cached result for repeated content"""
+        if self.cache is None and self.campaigns is None and not self.sender_history:
+            return await self.executor.score_email(raw_email)
+        
+        parsed_email = await self.executor.parse_email(raw_email)
+        if self.campaigns is not None:
+            prediction = self._campaign_verdict(parsed_email)
+            if prediction is not None:
+                return parsed_email, prediction
+        await self._add_sender_features([parsed_email])
+        if self.cache is None:
+            return parsed_email, await self.executor.predict(parsed_email)
+        
+        key = content_key(parsed_email, parsed_email["sender_domain"], self.classifier.version)
+        
+        prediction = self.cache.get(key)
+        if prediction is None:
+            prediction = await self.executor.predict(parsed_email)
+            self.cache.set(key, prediction)
+        return parsed_email, prediction
+    
+    async def _score_batch(self, raw_emails):
+        """score_batch, with emails matching a confirmed campaign left out of the model call"""
+        parsed_emails = await self.executor.parse_batch(raw_emails)
+        predictions = [None] * len(parsed_emails)
+        if self.campaigns is not None:
+            predictions = [self._campaign_verdict(parsed_email) for parsed_email in parsed_emails]
+        
+        undecided = [i for i, prediction in enumerate(predictions) if prediction is None]
+        if undecided:
+            await self._add_sender_features([parsed_emails[i] for i in undecided])
+            model_predictions = await self.executor.predict_batch([parsed_emails[i] for i in undecided])
+            for i, prediction in zip(undecided, model_predictions):
+                predictions[i] = prediction
+        return list(zip(parsed_emails, predictions))
+    
+    async def _add_sender_features(self, parsed_emails):
+        """Attach sender features, with the history loaded through the async session, for scoring"""
+        if not self.sender_history:
+            return
+        sender_cache = self.processor.sender_cache
+        # Pasted text shares one placeholder sender, which has no history of its own
+        senders = [parsed_email for parsed_email in parsed_emails if parsed_email["headers"]["from"] != PLACEHOLDER_SENDER]
+        with timed("sender_history"):
+            await sender_cache.prefetch([parsed_email["sender_domain"] for parsed_email in senders])
+        for parsed_email in parsed_emails:
+            parsed_email["sender_features"] = dict(NO_SENDER_FEATURES)
+        for parsed_email in senders:
+            parsed_email["sender_features"] = sender_cache.features(parsed_email["sender_domain"])
+    
+    def _campaign_verdict(self, parsed_email):
+        """The verdict of a near-duplicate confirmed as fraud as a prediction, or None"""
+        with timed("campaign_match"):
+            # Kept with the email so it can be indexed once saved
+            parsed_email["campaign_signature"] = self.campaigns.signature(parsed_email["document"].text_lower)
+            match = self.campaigns.match(parsed_email["campaign_signature"])
+        # The signature only covers the visible text, so a phishing clone of a
+        # legitimate newsletter with its links swapped would match it; only
+        # fraud verdicts are inherited, everything else goes through scoring
+        if match is None or not match["verdict"]:
+            return None
+        
+        return {
+            "fraud_probability": 1.0,
+            "is_fraud": True,
+            "indicators": [{
+                "type": "campaign_match",
+                "description": f"Near-duplicate ({match['similarity']:.0%} similar) of email {match['email_id']} "
+                               f"in campaign {match['campaign_id']}, confirmed as fraud",
+                "severity": 9
+            }],
+            "model_version": self.classifier.version,
+            "decided_by": "campaign"
+        }
+    
+    def _index_campaign(self, email_id, parsed_email):
+        # Emails saved through the write-behind queue have no id yet; they are
+        # added from the database on the next startup
+        if self.campaigns is not None and email_id is not None:
+            self.campaigns.add(email_id, parsed_email.get("campaign_signature"))
+    
+    async def _save(self, db, record):
+        """Persist one analysis record, via the write-behind queue when enabled"""
+        if self.write_behind is not None and self.write_behind.submit(record):
+            # The id is assigned when the background batch is written
+            return None
+        return (await save_records_async(db, [record]))[0]
+    
+    def _build_raw_email(self, email_content):
+        """Convert text to raw email format"""
+        # This is simplified - a real implementation would create proper email structure
+        # Headers must start on the first line, otherwise they are parsed as body text
+        raw_email = f"""From: {PLACEHOLDER_SENDER}
+To: user@example.com
+Subject: {" ".join(email_content[:50].split())}
+Date: {datetime.now().strftime('%a, %d %b %Y %H:%M:%S +0000')}
+Content-Type: text/plain
+
+{email_content}
+"""
+        return raw_email.encode()
+    
+    def _text_preview(self, email_content):
+        """Short preview of analyzed text for responses"""
+        return {
+            "text": email_content[:100] + "..." if len(email_content) > 100 else email_content
+        }
+    
+    async def provide_feedback(self, email_id, is_fraud, db: AsyncSession):
+        """Record user feedback for the next model retraining"""
+        email = await db.get(Email, email_id)
+        if not email:
+            return {"success": False, "message": "Email not found"}
+        
+        # Buffer the labeled features; retraining happens in the background
+        parsed_email = await self.executor.parse_email(build_stored_raw_email(
+            email.sender, email.subject, email.body, email.authentication_results
+        ))
+        # Sender history as it was when the email was analyzed: by now it would
+        # count this email and its verdict, leaking the label into the features
+        parsed_email["sender_features"] = stored_sender_features(self.processor, email.sender_features, parsed_email)
+        feature_row = await self.executor.feature_row(parsed_email)
+        db.add(FeedbackSample(
+            email_id=email.id, features=feature_row, feature_names=list(self.classifier.features), is_fraud=is_fraud
+        ))
+        
+        # Update the database and the user's dashboard counters
+        stat_rows = feedback_stat_rows(email, email.is_fraud, is_fraud)
+        email.is_fraud = is_fraud
+        if stat_rows:
+            await db.execute(upsert_stats_statement(db.get_bind().dialect.name), stat_rows)
+        await db.commit()
+        
+        # Later near-duplicates of this email inherit the confirmed verdict
+        if self.campaigns is not None and not self.campaigns.confirm(email.id, is_fraud):
+            self.campaigns.add(email.id, self.campaigns.signature(EmailDocument.from_body(email.body or "").text_lower), is_fraud)
+        
+        return {"success": True, "message": "Feedback recorded"}
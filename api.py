@@ -1,117 +1,415 @@
-# backend/app/routes/api.py
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from pydantic import BaseModel
-from ..services.analyzer import EmailAnalyzer
-from ..models.email_model import Email, FraudIndicator
-from ..database import get_db
-
-router = APIRouter()
-analyzer = EmailAnalyzer()
-
-# Models for request/response
-class EmailAnalysisRequest(BaseModel):
-    content: str
-    
-class FeedbackRequest(BaseModel):
-    email_id: int
-    is_fraud: bool
-    
-class IndicatorResponse(BaseModel):
-    type: str
-    description: str
-    severity: int
-    evidence: Optional[str] = None
-    
-class AnalysisResponse(BaseModel):
-    fraud_probability: float
-    is_fraud: bool
-    indicators: List[IndicatorResponse]
-    
-class EmailResponse(BaseModel):
-    id: Optional[int]
-    sender: str
-    subject: str
-    fraud_score: float
-    is_fraud: bool
-    indicators: List[IndicatorResponse]
-    analyzed_at: str
-
-@router.post("/analyze/upload", response_model=EmailResponse)
-async def analyze_email_upload(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db)
-):
-    """Analyze an uploaded email file"""
-    try:
-        content = await file.read()
-        result = await analyzer.analyze_email(content, db)
-        
-        return {
-            "id": result["id"],
-            "sender": result["email_data"]["sender"],
-            "subject": result["email_data"]["subject"],
-            "fraud_score": result["analysis"]["fraud_probability"],
-            "is_fraud": result["analysis"]["is_fraud"],
-            "indicators": result["analysis"]["indicators"],
-            "analyzed_at": result["analysis"]["analysis_date"] if "analysis_date" in result["analysis"] else str(datetime.now())
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@router.post("/analyze/text", response_model=AnalysisResponse)
-async def analyze_email_text(request: EmailAnalysisRequest):
-    """Analyze email content provided as text"""
-    try:
-        result = await analyzer.analyze_text(request.content)
-        return result["analysis"]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@router.post("/feedback")
-async def provide_feedback(
-    request: FeedbackRequest,
-    db: Session = Depends(get_db)
-):
-    """Provide feedback on an analysis to improve the model"""
-    try:
-        result = analyzer.provide_feedback(request.email_id, request.is_fraud, db)
-        if not result["success"]:
-            raise HTTPException(status_code=404, detail=result["message"])
-        return {"message": "Feedback recorded successfully"}
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@router.get("/emails", response_model=List[EmailResponse])
-async def get_user_emails(user_id: int, db: Session = Depends(get_db)):
-    """Get all analyzed emails for a user"""
-    emails = db.query(Email).filter(Email.user_id == user_id).all()
-    
-    result = []
-    for email in emails:
-        indicators = db.query(FraudIndicator).filter(FraudIndicator.email_id == email.id).all()
-        indicator_responses = [
-            IndicatorResponse(
-                type=indicator.indicator_type,
-                description=indicator.description,
-                severity=indicator.severity,
-                evidence=indicator.evidence
-            ) for indicator in indicators
-        ]
-        
-        result.append(
-            EmailResponse(
-                id=email.id,
-                sender=email.sender,
-                subject=email.subject,
-                fraud_score=email.fraud_score,
-                is_fraud=email.is_fraud,
-                indicators=indicator_responses,
-                analyzed_at=str(email.analysis_date)
-            )
-        )
-    
-    return result
+# backend/app/routes/api.py
+import asyncio
+import base64
+from datetime import datetime
+from email.parser import BytesFeedParser
+from email.policy import default
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File, Form, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+from ..services.admission import AdmissionController, AdmissionRejected
+from ..services.analyzer import EmailAnalyzer
+from ..services.executor import QueueFullError
+from ..services.jobs import JobQueue, JobQueueFullError, create_job_store
+from ..services.user_stats import load_user_stats
+from ..models.email_model import Email
+from ..database import create_async_session, get_async_db
+from config import settings
+
+router = APIRouter()
+analyzer = EmailAnalyzer(settings.MODEL_PATH)
+jobs = JobQueue(create_job_store(), workers=settings.JOB_WORKERS, max_pending=settings.JOB_QUEUE_SIZE)
+admission = AdmissionController(
+    client_rate=settings.ADMISSION_CLIENT_RATE,
+    client_burst=settings.ADMISSION_CLIENT_BURST,
+    global_rate=settings.ADMISSION_GLOBAL_RATE,
+    global_burst=settings.ADMISSION_GLOBAL_BURST,
+    max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+    degrade_at=settings.DEGRADED_IN_FLIGHT,
+    retry_after=settings.ADMISSION_RETRY_AFTER_SECONDS,
+    on_degraded=analyzer.executor.set_degraded
+)
+
+# Models for request/response
+class EmailAnalysisRequest(BaseModel):
+    content: str
+    
+class BatchAnalysisRequest(BaseModel):
+    contents: List[str]
+    user_id: Optional[int] = None
+    
+class FeedbackRequest(BaseModel):
+    email_id: int
+    is_fraud: bool
+    
+class IndicatorResponse(BaseModel):
+    type: str
+    description: str
+    severity: int
+    evidence: Optional[str] = None
+    
+class AnalysisResponse(BaseModel):
+    fraud_probability: float
+    is_fraud: bool
+    indicators: List[IndicatorResponse]
+    model_version: Optional[str] = None
+    # Scoring tier that produced the verdict, when tiered scoring is enabled
+    decided_by: Optional[str] = None
+    
+class EmailResponse(BaseModel):
+    id: Optional[int]
+    sender: str
+    subject: str
+    fraud_score: float
+    is_fraud: bool
+    indicators: List[IndicatorResponse]
+    analyzed_at: str
+    model_version: Optional[str] = None
+    decided_by: Optional[str] = None
+    # Part of the email was beyond the analysis limits and was not analyzed
+    truncated: bool = False
+    
+class EmailPageResponse(BaseModel):
+    items: List[EmailResponse]
+    next_cursor: Optional[str] = None
+    
+class DailyStatsResponse(BaseModel):
+    day: str
+    analyzed: int
+    fraud: int
+    
+class UserStatsResponse(BaseModel):
+    user_id: int
+    since: str
+    total_analyzed: int
+    fraud_count: int
+    fraud_rate: float
+    feedback_count: int
+    score_histogram: List[int]
+    indicator_counts: Dict[str, int]
+    daily: List[DailyStatsResponse]
+    
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    error: Optional[str] = None
+
+@router.post("/analyze/upload", response_model=EmailResponse)
+async def analyze_email_upload(
+    http_request: Request,
+    file: UploadFile = File(...),
+    user_id: Optional[int] = Form(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Analyze an uploaded email file"""
+    # Checked before the upload is parsed
+    with _admit(http_request):
+        message = await _read_upload(file)
+        try:
+            result = await analyzer.analyze_email(message, db, user_id)
+            return _email_response(result)
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+def _email_response(result):
+    return {
+        "id": result["id"],
+        "sender": result["email_data"]["sender"],
+        "subject": result["email_data"]["subject"],
+        "fraud_score": result["analysis"]["fraud_probability"],
+        "is_fraud": result["analysis"]["is_fraud"],
+        "indicators": result["analysis"]["indicators"],
+        "analyzed_at": result["analysis"]["analysis_date"] if "analysis_date" in result["analysis"] else str(datetime.now()),
+        "model_version": result["analysis"]["model_version"],
+        "decided_by": result["analysis"].get("decided_by"),
+        "truncated": result["email_data"]["truncated"]
+    }
+
+async def _read_upload(file: UploadFile):
+    """Feed an upload to the email parser chunk by chunk instead of reading it whole"""
+    parser = BytesFeedParser(policy=default)
+    size = 0
+    while True:
+        chunk = await file.read(settings.UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > settings.MAX_UPLOAD_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Email too large (max {settings.MAX_UPLOAD_BYTES} bytes)"
+            )
+        parser.feed(chunk)
+    return parser.close()
+
+@router.post("/analyze/text", response_model=AnalysisResponse)
+async def analyze_email_text(request: EmailAnalysisRequest, http_request: Request):
+    """Analyze email content provided as text"""
+    with _admit(http_request):
+        try:
+            result = await analyzer.analyze_text(request.content)
+            return result["analysis"]
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/analyze/batch", response_model=List[AnalysisResponse])
+async def analyze_email_batch(request: BatchAnalysisRequest, http_request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Analyze a batch of email contents in one call"""
+    _check_batch_size(request)
+    # Each email in the batch costs one token
+    with _admit(http_request, cost=len(request.contents)):
+        try:
+            results = await analyzer.analyze_batch(request.contents, db, request.user_id)
+            return [result["analysis"] for result in results]
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+def _admit(http_request: Request, cost=1):
+    """Admission ticket for an analysis, or a 429/503 with Retry-After when over a limit"""
+    try:
+        return admission.admit(_client_id(http_request), cost)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
+
+def _client_id(http_request: Request):
+    if settings.ADMISSION_CLIENT_HEADER:
+        client = http_request.headers.get(settings.ADMISSION_CLIENT_HEADER)
+        if client:
+            return client
+    return http_request.client.host if http_request.client else "unknown"
+
+def _check_batch_size(request: BatchAnalysisRequest):
+    if len(request.contents) > settings.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large (max {settings.MAX_BATCH_SIZE} emails)"
+        )
+
+@router.post("/jobs/analyze/upload", response_model=JobResponse, status_code=202)
+async def submit_upload_job(
+    http_request: Request,
+    file: UploadFile = File(...),
+    user_id: Optional[int] = Form(None)
+):
+    """Queue analysis of an uploaded email file and return the job right away"""
+    # Checked before the upload is parsed, like the synchronous route
+    ticket = _admit(http_request)
+    try:
+        message = await _read_upload(file)
+    except BaseException:
+        ticket.release()
+        raise
+    
+    async def run():
+        # The request's session is closed by the time the job runs
+        async with create_async_session() as db:
+            return _email_response(await analyzer.analyze_email(message, db, user_id))
+    
+    return await _submit_job("upload", run, ticket)
+
+@router.post("/jobs/analyze/text", response_model=JobResponse, status_code=202)
+async def submit_text_job(request: EmailAnalysisRequest, http_request: Request):
+    """Queue analysis of email content provided as text"""
+    async def run():
+        return (await analyzer.analyze_text(request.content))["analysis"]
+    
+    return await _submit_job("text", run, _admit(http_request))
+
+@router.post("/jobs/analyze/batch", response_model=JobResponse, status_code=202)
+async def submit_batch_job(request: BatchAnalysisRequest, http_request: Request):
+    """Queue analysis of a batch of email contents"""
+    _check_batch_size(request)
+    
+    async def run():
+        async with create_async_session() as db:
+            results = await analyzer.analyze_batch(request.contents, db, request.user_id)
+        return [result["analysis"] for result in results]
+    
+    return await _submit_job("batch", run, _admit(http_request, cost=len(request.contents)))
+
+async def _submit_job(kind, run, ticket):
+    # Admitted like the synchronous routes; the in-flight slot is held until the job has run
+    async def admitted_run():
+        with ticket:
+            return await run()
+    
+    try:
+        return await jobs.submit(kind, admitted_run)
+    except JobQueueFullError as e:
+        ticket.release()
+        # Tell clients to back off instead of retrying immediately
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(settings.JOB_RETRY_AFTER_SECONDS)})
+    except BaseException:
+        ticket.release()
+        raise
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """Status of a submitted analysis job"""
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Result of a finished job; 202 with the job status while it is still running"""
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job["error"])
+    if job["status"] != "done":
+        return JSONResponse(status_code=202, content={key: value for key, value in job.items() if key != "result"})
+    return job["result"]
+
+@router.post("/feedback")
+async def provide_feedback(
+    request: FeedbackRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Provide feedback on an analysis to improve the model"""
+    try:
+        result = await analyzer.provide_feedback(request.email_id, request.is_fraud, db)
+        if not result["success"]:
+            raise HTTPException(status_code=404, detail=result["message"])
+        return {"message": "Feedback recorded successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/model")
+async def get_model_info():
+    """Version and manifest of the model currently serving predictions"""
+    classifier = analyzer.classifier
+    return {
+        "version": classifier.version,
+        "threshold": classifier.threshold,
+        "features": classifier.features,
+        "manifest": classifier.manifest
+    }
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters for the analysis result cache"""
+    if analyzer.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **analyzer.cache.stats()}
+
+@router.get("/sender-cache/stats")
+async def get_sender_cache_stats():
+    """Size and hit/miss counters for the per-sender-domain feature cache"""
+    sender_cache = analyzer.processor.sender_cache
+    if sender_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **sender_cache.stats()}
+
+@router.get("/campaigns/stats")
+async def get_campaign_stats():
+    """Size and memory use of the near-duplicate campaign index"""
+    if analyzer.campaigns is None:
+        return {"enabled": False}
+    return {"enabled": True, **analyzer.campaigns.stats()}
+
+@router.get("/admission/stats")
+async def get_admission_stats():
+    """In-flight analyses and limiter state of this API worker"""
+    return admission.stats()
+
+@router.post("/reputation/reload")
+async def reload_reputation():
+    """Reload the domain blocklists without restarting the server"""
+    try:
+        return await asyncio.to_thread(analyzer.reload_reputation)
+    except OSError as e:
+        raise HTTPException(status_code=500, detail=f"Could not load blocklists: {e}")
+
+@router.get("/stats", response_model=UserStatsResponse)
+async def get_user_stats(
+    user_id: int,
+    days: int = Query(30, ge=1, le=366),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Dashboard statistics from the pre-aggregated daily counters"""
+    return await load_user_stats(db, user_id, days)
+
+@router.get("/emails", response_model=EmailPageResponse)
+async def get_user_emails(
+    user_id: int,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    is_fraud: Optional[bool] = None,
+    min_score: Optional[float] = None,
+    max_score: Optional[float] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get analyzed emails for a user, newest first, one page at a time"""
+    # Indicators for the whole page are loaded with one extra query
+    query = (
+        select(Email)
+        .options(selectinload(Email.indicators))
+        .where(Email.user_id == user_id, Email.analysis_date.isnot(None))
+    )
+    if is_fraud is not None:
+        query = query.where(Email.is_fraud == is_fraud)
+    if min_score is not None:
+        query = query.where(Email.fraud_score >= min_score)
+    if max_score is not None:
+        query = query.where(Email.fraud_score <= max_score)
+    if cursor:
+        analysis_date, email_id = _decode_cursor(cursor)
+        query = query.where(tuple_(Email.analysis_date, Email.id) < tuple_(analysis_date, email_id))
+    
+    # Fetch one extra row to know whether another page exists
+    result = await db.execute(query.order_by(Email.analysis_date.desc(), Email.id.desc()).limit(limit + 1))
+    emails = result.scalars().all()
+    next_cursor = _encode_cursor(emails[limit - 1]) if len(emails) > limit else None
+    
+    items = [
+        EmailResponse(
+            id=email.id,
+            sender=email.sender,
+            subject=email.subject,
+            fraud_score=email.fraud_score,
+            is_fraud=email.is_fraud,
+            indicators=[
+                IndicatorResponse(
+                    type=indicator.indicator_type,
+                    description=indicator.description,
+                    severity=indicator.severity,
+                    evidence=indicator.evidence
+                ) for indicator in email.indicators
+            ],
+            analyzed_at=str(email.analysis_date)
+        )
+        for email in emails[:limit]
+    ]
+    
+    return EmailPageResponse(items=items, next_cursor=next_cursor)
+
+def _encode_cursor(email):
+    """Opaque cursor pointing at the last email of a page"""
+    value = f"{email.analysis_date.isoformat()}|{email.id}"
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+def _decode_cursor(cursor):
+    try:
+        analysis_date, email_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(analysis_date), int(email_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
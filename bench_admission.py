@@ -0,0 +1,164 @@
+# backend/benchmarks/bench_admission.py
+"""Latency of well-behaved clients while one client floods /api/analyze/text.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_admission
+    python -m benchmarks.bench_admission --storm-concurrency 32 --client-rate 20 --max-in-flight 16
+
+An in-process load generator: each quiet client sends one email at a time,
+retrying rejected requests after Retry-After, while the storm client keeps
+--storm-concurrency requests open and retries immediately. The same load
+runs without admission control, with it, and with it plus degraded mode,
+reporting status counts and p50/p99 latency per kind of client (for quiet
+clients, from the first attempt to the accepted one).
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+import numpy as np
+from benchmarks.synthetic_corpus import generate_corpus
+
+CLIENT_HEADER = "X-Bench-Client"
+
+# Attempts a quiet client makes per email before giving up
+MAX_ATTEMPTS = 50
+
+def configure_environment():
+    """Scratch database, thread backend so requests overlap, no result cache.
+
+    Must run before the app modules are imported, since settings are read then.
+    """
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench_admission_"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    os.environ["RESULT_CACHE_SIZE"] = "0"
+    os.environ["ANALYSIS_BACKEND"] = "thread"
+    os.environ["WRITE_BEHIND_ENABLED"] = "false"
+    os.environ["RETRAIN_ENABLED"] = "false"
+    os.environ["WARM_UP_ON_STARTUP"] = "false"
+    os.environ["MODEL_PATH"] = ""
+    os.environ["ALLOW_UNTRAINED_MODEL"] = "true"
+    os.environ["ADMISSION_CLIENT_HEADER"] = CLIENT_HEADER
+
+def summarize(statuses, latencies):
+    summary = {"requests": sum(statuses.values()), "status": dict(sorted(statuses.items(), key=str))}
+    if latencies:
+        latencies_ms = np.array(latencies) * 1000
+        summary["ok_p50_ms"] = round(float(np.percentile(latencies_ms, 50)), 1)
+        summary["ok_p99_ms"] = round(float(np.percentile(latencies_ms, 99)), 1)
+    return summary
+
+async def generate_load(client, texts, quiet_clients, quiet_requests, storm_concurrency, storm_retry_seconds):
+    """Run the quiet clients to completion while the storm client floods, returning per-kind summaries"""
+    results = {kind: (Counter(), []) for kind in ("quiet", "storm")}
+    done = asyncio.Event()
+
+    async def send(kind, client_id, text):
+        statuses, _ = results[kind]
+        response = await client.post("/api/analyze/text", json={"content": text}, headers={CLIENT_HEADER: client_id})
+        statuses[response.status_code] += 1
+        return response
+
+    async def quiet(number):
+        statuses, latencies = results["quiet"]
+        for i in range(quiet_requests):
+            start = time.perf_counter()
+            for _ in range(MAX_ATTEMPTS):
+                response = await send("quiet", f"quiet-{number}", texts[(number + i) % len(texts)])
+                if response.status_code == 200:
+                    # Latency includes the waits before any retries
+                    latencies.append(time.perf_counter() - start)
+                    break
+                # Well-behaved clients honour Retry-After (scaled down to keep the run short)
+                await asyncio.sleep(int(response.headers.get("Retry-After", 1)) / 10)
+            else:
+                statuses["gave_up"] += 1
+
+    async def storm(worker):
+        statuses, latencies = results["storm"]
+        i = worker
+        while not done.is_set():
+            start = time.perf_counter()
+            response = await send("storm", "storm", texts[i % len(texts)])
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                # Retries at once; the pause stands in for a network round trip
+                await asyncio.sleep(storm_retry_seconds)
+            i += storm_concurrency
+
+    storm_tasks = [asyncio.create_task(storm(worker)) for worker in range(storm_concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*(quiet(number) for number in range(quiet_clients)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await asyncio.gather(*storm_tasks)
+
+    summaries = {kind: summarize(statuses, latencies) for kind, (statuses, latencies) in results.items()}
+    summaries["seconds"] = round(elapsed, 2)
+    return summaries
+
+async def run_scenarios(args):
+    configure_environment()
+    import httpx
+    from app.main import app
+    from app.routes import api
+    from app.services.admission import AdmissionController
+
+    corpus = generate_corpus(args.emails, args.seed)
+    texts = [raw_email.decode("utf-8", "replace") for _, _, raw_email in corpus]
+    analyzer = api.analyzer
+    parsed_emails = [analyzer.processor.parse_email(raw_email) for _, _, raw_email in corpus]
+    X = [analyzer.classifier.feature_row(parsed_email) for parsed_email in parsed_emails]
+    y = [1 if is_phishing else 0 for _, is_phishing, _ in corpus]
+    analyzer.classifier.swap_model(analyzer.classifier.fit_model(X, y, n_jobs=None))
+
+    limits = {
+        "client_rate": args.client_rate,
+        "client_burst": args.client_burst,
+        "global_rate": args.global_rate,
+        "max_in_flight": args.max_in_flight,
+        "on_degraded": analyzer.executor.set_degraded
+    }
+    scenarios = {
+        "unlimited": AdmissionController(),
+        "limited": AdmissionController(**limits),
+        "limited_degraded": AdmissionController(degrade_at=max(1, args.max_in_flight // 2), **limits)
+    }
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name, controller in scenarios.items():
+                api.admission = controller
+                results[name] = await generate_load(
+                    client, texts, args.quiet_clients, args.quiet_requests, args.storm_concurrency,
+                    args.storm_retry_ms / 1000
+                )
+                results[name]["degraded_at_end"] = controller.degraded
+                analyzer.executor.set_degraded(False)
+    return {"limits": {key: value for key, value in limits.items() if key != "on_degraded"}, "scenarios": results}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--emails", type=int, default=100, help="Corpus size, cycling through the message kinds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quiet-clients", type=int, default=4)
+    parser.add_argument("--quiet-requests", type=int, default=10, help="Requests sent by each quiet client")
+    parser.add_argument("--storm-concurrency", type=int, default=16, help="Requests the storm client keeps open")
+    parser.add_argument("--storm-retry-ms", type=float, default=5, help="Pause before the storm client retries a rejected request")
+    parser.add_argument("--client-rate", type=float, default=5, help="Per-client emails/second when limited")
+    parser.add_argument("--client-burst", type=int, default=5)
+    parser.add_argument("--global-rate", type=float, default=0, help="Emails/second for all clients together (0 for no limit)")
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run_scenarios(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# backend/benchmarks/bench_forest.py
+"""Latency of sklearn predict_proba versus the flattened NumPy forest.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_forest
+    python -m benchmarks.bench_forest --model-path model/fraud_model.joblib
+"""
+import argparse
+import json
+import time
+import numpy as np
+from app.services.forest_engine import FlatForest
+from app.services.ml_classifier import FraudClassifier
+from app.services.model_store import load_artifact
+
+BATCH_SIZES = (1, 64, 4096)
+
+def synthetic_training_data(rows, seed=0):
+    """Feature rows on roughly the scale extract_features produces"""
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.integers(50, 5000, rows),        # body_length
+        rng.integers(0, 2, rows),            # contains_html
+        rng.poisson(2, rows),                # fraud_keyword_count
+        rng.random(rows) * 0.2,              # fraud_keyword_ratio
+        rng.poisson(3, rows),                # link_count
+        rng.poisson(1, rows),                # suspicious_links
+        rng.random(rows),                    # suspicious_link_ratio
+        rng.poisson(1.5, rows),              # urgency_score
+        rng.poisson(4, rows)                 # grammar_mistakes
+    ]).astype(float)
+    score = X[:, 3] * 10 + X[:, 6] + X[:, 7] * 0.3 + rng.normal(0, 0.5, rows)
+    y = (score > np.median(score)).astype(int)
+    return X, y
+
+def time_calls(predict_proba, X, min_seconds):
+    """Mean seconds per call, repeating until min_seconds have elapsed"""
+    predict_proba(X)
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        predict_proba(X)
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / calls
+
+def run(model_path, min_seconds, seed):
+    if model_path:
+        model, _ = load_artifact(model_path)
+    else:
+        X_train, y_train = synthetic_training_data(5000, seed)
+        # Same estimator settings as the served model, single-threaded like a request
+        model = FraudClassifier().fit_model(X_train, y_train, n_jobs=None)
+    flat = FlatForest.from_sklearn(model)
+
+    X_all, _ = synthetic_training_data(max(BATCH_SIZES), seed + 1)
+    results = {"trees": len(model.estimators_), "nodes": int(flat.feature.shape[0]), "batches": {}}
+    for batch_size in BATCH_SIZES:
+        X = X_all[:batch_size]
+        max_diff = float(np.abs(model.predict_proba(X) - flat.predict_proba(X)).max())
+        sklearn_seconds = time_calls(model.predict_proba, X, min_seconds)
+        flat_seconds = time_calls(flat.predict_proba, X, min_seconds)
+        results["batches"][batch_size] = {
+            "sklearn_ms": round(sklearn_seconds * 1000, 3),
+            "flat_ms": round(flat_seconds * 1000, 3),
+            "speedup": round(sklearn_seconds / flat_seconds, 2),
+            "max_abs_diff": max_diff
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-path", default="", help="Saved artifact to benchmark instead of a synthetic forest")
+    parser.add_argument("--min-seconds", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(run(args.model_path, args.min_seconds, args.seed), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# backend/benchmarks/bench_grammar.py
+"""Parity and cost of the grammar_mistakes feature in each GRAMMAR_MODE.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_grammar
+    python -m benchmarks.bench_grammar --emails 1000 --seed 3
+
+Counts grammar issues on the visible text of every corpus email with the
+full spaCy pipeline, the tokenizer alone and the regex approximation.
+Exits with status 1 if any mode gives a different grammar_mistakes value
+than the full pipeline on some email, listing the first few. The regex
+mode approximates the tokenizer, so a mismatch there on new text means
+the approximation needs another rule (or that text needs the tokenizer).
+"""
+import argparse
+import json
+import sys
+import time
+from benchmarks.synthetic_corpus import generate_corpus
+from app.services.email_document import EmailDocument
+from app.services.email_processor import GRAMMAR_MODES, EmailProcessor, get_nlp
+
+# Mismatching texts shown per mode
+MAX_EXAMPLES = 3
+
+def run(emails, seed):
+    nlp = get_nlp()
+    processors = {mode: EmailProcessor(nlp=nlp, grammar_mode=mode) for mode in GRAMMAR_MODES}
+    reference = processors["spacy"]
+    texts = [
+        EmailDocument.from_body(reference.parse_email(raw_email)["body"]).text
+        for _, _, raw_email in generate_corpus(emails, seed)
+    ]
+
+    counts = {}
+    results = {}
+    for mode, processor in processors.items():
+        start = time.perf_counter()
+        counts[mode] = [processor._count_grammar_issues(text) for text in texts]
+        results[mode] = {"ms_per_email": round((time.perf_counter() - start) * 1000 / len(texts), 3)}
+
+    for mode in GRAMMAR_MODES:
+        mismatches = [i for i, (count, expected) in enumerate(zip(counts[mode], counts["spacy"])) if count != expected]
+        results[mode]["mismatches"] = len(mismatches)
+        results[mode]["examples"] = [
+            {"text": texts[i][:200], "count": counts[mode][i], "spacy": counts["spacy"][i]}
+            for i in mismatches[:MAX_EXAMPLES]
+        ]
+    return {"emails": len(texts), "seed": seed, "modes": results}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--emails", type=int, default=400, help="Corpus size, cycling through the message kinds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    result = run(args.emails, args.seed)
+    print(json.dumps(result, indent=2))
+    if any(mode["mismatches"] for mode in result["modes"].values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# backend/benchmarks/bench_suite.py
+"""Throughput and p50/p99 latency of the analysis pipeline on a synthetic corpus.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_suite --output baseline.json
+    python -m benchmarks.bench_suite --baseline baseline.json --threshold 0.2
+
+With --baseline, exits with status 1 if any benchmark's p50 latency or
+throughput is worse than the baseline by more than the threshold.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import numpy as np
+from benchmarks.synthetic_corpus import generate_corpus
+
+BATCH_SIZE = 32
+
+def summarize(latencies, elapsed, items_per_call=1):
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "calls": len(latencies),
+        "throughput_per_sec": round(len(latencies) * items_per_call / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "mean_ms": round(float(latencies_ms.mean()), 3)
+    }
+
+def measure(func, items, iterations, items_per_call=1):
+    """Call func on every item, iterations times, after one untimed pass"""
+    for item in items:
+        func(item)
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for item in items:
+            call_start = time.perf_counter()
+            func(item)
+            latencies.append(time.perf_counter() - call_start)
+    return summarize(latencies, time.perf_counter() - start, items_per_call)
+
+async def measure_async(func, items, iterations):
+    for item in items:
+        await func(item)
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for item in items:
+            call_start = time.perf_counter()
+            await func(item)
+            latencies.append(time.perf_counter() - call_start)
+    return summarize(latencies, time.perf_counter() - start)
+
+def configure_environment(model_path):
+    """Point the app at a scratch database with caching and background jobs off.
+
+    Must run before the app modules are imported, since settings are read then.
+    """
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench_suite_"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    # Repeated corpus emails would otherwise be served from the result cache
+    os.environ["RESULT_CACHE_SIZE"] = "0"
+    os.environ["ANALYSIS_BACKEND"] = "inline"
+    os.environ["WRITE_BEHIND_ENABLED"] = "false"
+    os.environ["RETRAIN_ENABLED"] = "false"
+    os.environ["MODEL_PATH"] = model_path
+    os.environ["ALLOW_UNTRAINED_MODEL"] = "false" if model_path else "true"
+
+def run(emails, iterations, seed, model_path):
+    configure_environment(model_path)
+    from fastapi.testclient import TestClient
+    from app.database import create_session
+    from app.main import app
+    from app.models.email_model import User
+    from app.routes.api import analyzer
+
+    processor = analyzer.processor
+    classifier = analyzer.classifier
+    corpus = generate_corpus(emails, seed)
+    raw_emails = [raw_email for _, _, raw_email in corpus]
+    texts = [raw_email.decode("utf-8", "replace") for raw_email in raw_emails]
+    parsed_emails = [processor.parse_email(raw_email) for raw_email in raw_emails]
+
+    if not model_path:
+        # A forest fitted on the corpus itself, so predictions exercise real trees
+        X = [classifier.feature_row(parsed_email) for parsed_email in parsed_emails]
+        y = [1 if is_phishing else 0 for _, is_phishing, _ in corpus]
+        classifier.swap_model(classifier.fit_model(X, y, n_jobs=None))
+
+    results = {
+        "parse_email": measure(processor.parse_email, raw_emails, iterations),
+        "extract_features": measure(processor.extract_features, parsed_emails, iterations),
+        "predict": measure(classifier.predict, parsed_emails, iterations),
+        "analyze_text": asyncio.run(measure_async(analyzer.analyze_text, texts, iterations))
+    }
+
+    batches = [texts[start:start + BATCH_SIZE] for start in range(0, len(texts), BATCH_SIZE)]
+    with TestClient(app) as client:
+        with create_session() as db:
+            db.merge(User(id=1, username="bench", email="bench@example.com"))
+            db.commit()
+
+        def post(path, **kwargs):
+            response = client.post(path, **kwargs)
+            response.raise_for_status()
+
+        results["route_analyze_text"] = measure(
+            lambda text: post("/api/analyze/text", json={"content": text}), texts, iterations
+        )
+        results["route_analyze_upload"] = measure(
+            lambda raw_email: post("/api/analyze/upload", files={"file": ("email.eml", raw_email)}, data={"user_id": "1"}),
+            raw_emails,
+            iterations
+        )
+        results["route_analyze_batch"] = measure(
+            lambda batch: post("/api/analyze/batch", json={"contents": batch, "user_id": 1}),
+            batches,
+            iterations,
+            items_per_call=len(texts) / len(batches)
+        )
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "grammar_mode": processor.grammar_mode,
+            "inference_engine": classifier.engine
+        },
+        "corpus": {"emails": emails, "seed": seed, "iterations": iterations},
+        "benchmarks": results
+    }
+
+def compare(results, baseline, threshold):
+    """Relative changes against the baseline and the benchmarks that regressed"""
+    changes = {}
+    regressions = []
+    for name, current in results["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if not previous:
+            continue
+        changes[name] = {
+            metric: round(current[metric] / previous[metric] - 1, 3)
+            for metric in ("p50_ms", "p99_ms", "throughput_per_sec")
+            if previous.get(metric)
+        }
+        # p99 is reported but not gated; it is too noisy on shared machines
+        if changes[name].get("p50_ms", 0) > threshold or changes[name].get("throughput_per_sec", 0) < -threshold:
+            regressions.append(name)
+    return changes, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--emails", type=int, default=50, help="Corpus size, cycling through the message kinds")
+    parser.add_argument("--iterations", type=int, default=3, help="Timed passes over the corpus per benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model-path", default="", help="Saved artifact to use instead of a forest fitted on the corpus")
+    parser.add_argument("--output", help="Write the results JSON here (usable as a later --baseline)")
+    parser.add_argument("--baseline", help="Results JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed relative slowdown, e.g. 0.15 for 15%%")
+    args = parser.parse_args()
+
+    results = run(args.emails, args.iterations, args.seed, args.model_path)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("corpus") != results["corpus"]:
+            print("Warning: baseline was measured on a different corpus", file=sys.stderr)
+        results["comparison"], regressions = compare(results, baseline, args.threshold)
+        results["regressions"] = regressions
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if regressions:
+        print(f"Regressed beyond {args.threshold:.0%}: {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+# backend/app/services/campaign_index.py
+import json
+import os
+import re
+import threading
+import zlib
+import numpy as np
+from sqlalchemy import select
+from ..models.email_model import Email, FeedbackSample
+from .email_document import EmailDocument
+
+# 64 MinHash values per email in 16 LSH bands of 4. Two emails share a band
+# with probability 1 - (1 - J^4)^16, about 50% at Jaccard similarity J = 0.5
+# and 99% at J = 0.7.
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+
+# Bodies are compared as sets of 3-word shingles over at most this many words
+SHINGLE_WORDS = 3
+MAX_WORDS = 500
+
+# Most candidates looked at per band, so one huge campaign can't make lookups slow
+MAX_CANDIDATES = 64
+
+# New rows are scanned linearly until this many are waiting to be merged into the sorted bands
+MERGE_ROWS = 4096
+
+UNCONFIRMED = -1
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+# Multiply-shift hashing: (a * x + b) mod 2^64, top 32 bits
+_MASK_32 = np.uint64(0xFFFFFFFF)
+_SHIFT_32 = np.uint64(32)
+# Odd constant mixing a band's packed 64-bit value into a 32-bit key
+_BAND_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+def _shingle_hashes(text):
+    words = _TOKEN_PATTERN.findall(text)[:MAX_WORDS]
+    if not words:
+        return None
+    word_hashes = np.fromiter((zlib.crc32(word.encode("utf-8", "surrogatepass")) for word in words),
+                              dtype=np.uint64, count=len(words))
+    if len(word_hashes) < SHINGLE_WORDS:
+        return np.unique(word_hashes)
+    # Combine each run of SHINGLE_WORDS word hashes into one 32-bit shingle hash
+    shingles = word_hashes[:len(word_hashes) - SHINGLE_WORDS + 1].copy()
+    with np.errstate(over="ignore"):
+        for offset in range(1, SHINGLE_WORDS):
+            shingles = shingles * np.uint64(1000003) + word_hashes[offset:len(word_hashes) - SHINGLE_WORDS + 1 + offset]
+    return np.unique((shingles ^ (shingles >> _SHIFT_32)) & _MASK_32)
+
+class CampaignIndex:
+    """MinHash/LSH index of analyzed email bodies, for finding near-duplicate campaign emails.
+
+    Each email costs a fixed number of bytes: its signature (64 16-bit
+    MinHash values), one sorted 32-bit key and row number per LSH band, and
+    its email id, campaign id and confirmed verdict, about 280 bytes in all.
+    Rows added since the last merge are scanned directly; every MERGE_ROWS
+    rows they are merged into the sorted bands.
+    """
+
+    def __init__(self, threshold=0.7, seed=1):
+        self.threshold = threshold
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self._hash_a = rng.integers(1, 2**63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+        self._hash_b = rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64)
+
+        self.size = 0
+        # Newest email id and feedback id loaded from the database, for incremental refreshes
+        self.max_email_id = 0
+        self.max_feedback_id = 0
+        self._signatures = np.zeros((0, NUM_PERM), dtype=np.uint16)
+        self._email_ids = np.zeros(0, dtype=np.int64)
+        self._campaigns = np.zeros(0, dtype=np.int64)
+        self._verdicts = np.zeros(0, dtype=np.int8)
+        # Per band, the keys of merged rows in sorted order and the row each came from
+        self._sorted_keys = np.zeros((BANDS, 0), dtype=np.uint32)
+        self._sorted_rows = np.zeros((BANDS, 0), dtype=np.int32)
+        self._merged = 0
+        self._lock = threading.Lock()
+
+    def signature(self, text):
+        """MinHash signature of a body's lowercased text, or None if it has no words"""
+        shingles = _shingle_hashes(text)
+        if shingles is None:
+            return None
+        with np.errstate(over="ignore"):
+            hashes = (self._hash_a[:, None] * shingles[None, :] + self._hash_b[:, None]) >> _SHIFT_32
+        # Only the low 16 bits are kept; equal values still mean equal MinHashes
+        # except for a 1 in 65536 chance, which barely moves the similarity
+        return hashes.min(axis=1).astype(np.uint16)
+
+    def match(self, signature):
+        """The closest indexed email at or above the threshold, preferring confirmed fraud, then confirmed ones.
+
+        Returns a dict with email_id, campaign_id, similarity and verdict
+        (True, False or None when unconfirmed), or None without a match.
+        """
+        if signature is None:
+            return None
+        with self._lock:
+            rows = self._candidates(signature)
+            if len(rows) == 0:
+                return None
+            similarities = (self._signatures[rows] == signature).mean(axis=1)
+            close = similarities >= self.threshold
+            if not close.any():
+                return None
+            rows, similarities = rows[close], similarities[close]
+
+            # A confirmed fraud copy wins over a closer legitimate one, which
+            # the analyzer would not let the email inherit
+            confirmed = self._verdicts[rows] == 1
+            if not confirmed.any():
+                confirmed = self._verdicts[rows] != UNCONFIRMED
+            if confirmed.any():
+                rows, similarities = rows[confirmed], similarities[confirmed]
+            best = int(np.argmax(similarities))
+            row = rows[best]
+            verdict = int(self._verdicts[row])
+            return {
+                "email_id": int(self._email_ids[row]),
+                "campaign_id": int(self._campaigns[row]),
+                "similarity": float(similarities[best]),
+                "verdict": None if verdict == UNCONFIRMED else bool(verdict)
+            }
+
+    def add(self, email_id, signature, verdict=None):
+        """Index an analyzed email, joining the campaign of its closest match"""
+        if signature is None:
+            return
+        closest = self.match(signature)
+        campaign_id = closest["campaign_id"] if closest else email_id
+        with self._lock:
+            self._append(email_id, campaign_id, signature, verdict)
+            self.max_email_id = max(self.max_email_id, email_id)
+            if self.size - self._merged >= MERGE_ROWS:
+                self._merge()
+
+    def confirm(self, email_id, is_fraud):
+        """Record a confirmed verdict (user feedback) for an indexed email"""
+        with self._lock:
+            rows = np.flatnonzero(self._email_ids[:self.size] == email_id)
+            self._verdicts[rows] = 1 if is_fraud else 0
+            return len(rows) > 0
+
+    def stats(self):
+        return {
+            "emails": self.size,
+            "campaigns": int(np.unique(self._campaigns[:self.size]).size),
+            "confirmed": int(np.count_nonzero(self._verdicts[:self.size] != UNCONFIRMED)),
+            "unmerged": self.size - self._merged,
+            "bytes": self.nbytes,
+            "max_email_id": self.max_email_id,
+            "max_feedback_id": self.max_feedback_id
+        }
+
+    @property
+    def nbytes(self):
+        arrays = (self._signatures, self._email_ids, self._campaigns, self._verdicts, self._sorted_keys, self._sorted_rows)
+        return sum(array.nbytes for array in arrays)
+
+    def save(self, path):
+        """Write a snapshot, replacing any earlier one atomically"""
+        with self._lock:
+            self._merge()
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    meta=np.array(json.dumps({
+                        "num_perm": NUM_PERM,
+                        "bands": BANDS,
+                        "seed": self.seed,
+                        "threshold": self.threshold,
+                        "max_email_id": self.max_email_id,
+                        "max_feedback_id": self.max_feedback_id
+                    })),
+                    signatures=self._signatures[:self.size],
+                    email_ids=self._email_ids[:self.size],
+                    campaigns=self._campaigns[:self.size],
+                    verdicts=self._verdicts[:self.size],
+                    sorted_keys=self._sorted_keys,
+                    sorted_rows=self._sorted_rows
+                )
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, threshold=None):
+        """Read a snapshot written by save"""
+        with np.load(path) as snapshot:
+            meta = json.loads(str(snapshot["meta"]))
+            if meta["num_perm"] != NUM_PERM or meta["bands"] != BANDS:
+                raise ValueError(f"Snapshot uses {meta['num_perm']} hashes in {meta['bands']} bands, expected {NUM_PERM} in {BANDS}")
+            index = cls(threshold if threshold is not None else meta["threshold"], meta["seed"])
+            index._signatures = snapshot["signatures"]
+            index._email_ids = snapshot["email_ids"]
+            index._campaigns = snapshot["campaigns"]
+            index._verdicts = snapshot["verdicts"]
+            index._sorted_keys = snapshot["sorted_keys"]
+            index._sorted_rows = snapshot["sorted_rows"]
+        index.size = index._merged = len(index._email_ids)
+        index.max_email_id = meta["max_email_id"]
+        index.max_feedback_id = meta["max_feedback_id"]
+        return index
+
+    def _band_keys(self, signatures):
+        # 4 16-bit values per band pack into exactly one uint64
+        packed = np.ascontiguousarray(signatures).view(np.uint64)
+        with np.errstate(over="ignore"):
+            return ((packed * _BAND_MIX) >> _SHIFT_32).astype(np.uint32)
+
+    def _candidates(self, signature):
+        keys = self._band_keys(signature[None, :])[0]
+        found = []
+        for band in range(BANDS):
+            band_keys = self._sorted_keys[band]
+            start = np.searchsorted(band_keys, keys[band], side="left")
+            end = np.searchsorted(band_keys, keys[band], side="right")
+            if end > start:
+                found.append(self._sorted_rows[band, start:min(end, start + MAX_CANDIDATES)])
+
+        # Rows not merged yet are compared band by band directly
+        if self.size > self._merged:
+            unmerged = self._signatures[self._merged:self.size].view(np.uint64)
+            query = signature.view(np.uint64)
+            found.append(np.flatnonzero((unmerged == query).any(axis=1)) + self._merged)
+
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def _append(self, email_id, campaign_id, signature, verdict):
+        if self.size == len(self._email_ids):
+            capacity = max(1024, 2 * self.size)
+            self._signatures = _grow(self._signatures, capacity)
+            self._email_ids = _grow(self._email_ids, capacity)
+            self._campaigns = _grow(self._campaigns, capacity)
+            self._verdicts = _grow(self._verdicts, capacity, UNCONFIRMED)
+        row = self.size
+        self._signatures[row] = signature
+        self._email_ids[row] = email_id
+        self._campaigns[row] = campaign_id
+        self._verdicts[row] = UNCONFIRMED if verdict is None else int(bool(verdict))
+        self.size += 1
+
+    def _merge(self):
+        if self.size == self._merged:
+            return
+        rows = np.arange(self._merged, self.size, dtype=np.int32)
+        keys = self._band_keys(self._signatures[self._merged:self.size])
+        sorted_keys, sorted_rows = [], []
+        for band in range(BANDS):
+            order = np.argsort(keys[:, band], kind="stable")
+            # Inserted after equal keys, so each band stays in row order within a key
+            positions = np.searchsorted(self._sorted_keys[band], keys[order, band], side="right")
+            sorted_keys.append(np.insert(self._sorted_keys[band], positions, keys[order, band]))
+            sorted_rows.append(np.insert(self._sorted_rows[band], positions, rows[order]))
+        self._sorted_keys = np.stack(sorted_keys)
+        self._sorted_rows = np.stack(sorted_rows)
+        self._merged = self.size
+
+def _grow(array, capacity, fill=0):
+    grown = np.full((capacity,) + array.shape[1:], fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+async def refresh_campaign_index(index, db, chunk_size=1000):
+    """Add emails and feedback stored since the index was last filled from the database"""
+    added = 0
+    while True:
+        result = await db.execute(
+            select(Email.id, Email.body)
+            .where(Email.id > index.max_email_id)
+            .order_by(Email.id)
+            .limit(chunk_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+        for email_id, body in rows:
+            # The same visible text the signature was taken from at analysis time
+            index.add(email_id, index.signature(EmailDocument.from_body(body or "").text_lower))
+        index.max_email_id = rows[-1][0]
+        added += len(rows)
+
+    # Feedback in id order, so the latest label for an email wins
+    result = await db.execute(
+        select(FeedbackSample.id, FeedbackSample.email_id, FeedbackSample.is_fraud)
+        .where(FeedbackSample.id > index.max_feedback_id)
+        .order_by(FeedbackSample.id)
+    )
+    confirmed = 0
+    for feedback_id, email_id, is_fraud in result:
+        confirmed += index.confirm(email_id, is_fraud)
+        index.max_feedback_id = feedback_id
+    return {"added": added, "confirmed": confirmed}
@@ -1,24 +1,132 @@
-# backend/config.py
-import os
-from pydantic import BaseSettings
-
-class Settings(BaseSettings):
-    # Database settings
-    DB_HOST: str = os.getenv("DB_HOST", "localhost")
-    DB_PORT: str = os.getenv("DB_PORT", "5432")
-    DB_NAME: str = os.getenv("DB_NAME", "email_fraud_db")
-    DB_USER: str = os.getenv("DB_USER", "postgres")
-    DB_PASSWORD: str = os.getenv("DB_PASSWORD", "password")
-    
-    # JWT settings
-    SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key")
-    ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
-    
-    # ML model settings
-    MODEL_PATH: str = os.getenv("MODEL_PATH", "model/fraud_model.pkl")
-    
-    class Config:
-        env_file = ".env"
-
-settings = Settings()
+# backend/config.py
+import os
+from pydantic import BaseSettings
+
+class Settings(BaseSettings):
+    # Database settings
+    DB_HOST: str = os.getenv("DB_HOST", "localhost")
+    DB_PORT: str = os.getenv("DB_PORT", "5432")
+    DB_NAME: str = os.getenv("DB_NAME", "email_fraud_db")
+    DB_USER: str = os.getenv("DB_USER", "postgres")
+    DB_PASSWORD: str = os.getenv("DB_PASSWORD", "password")
+    # Full URLs override the settings above, e.g. sqlite+aiosqlite:///test.db for tests
+    DATABASE_URL: str = os.getenv("DATABASE_URL", "")
+    ASYNC_DATABASE_URL: str = os.getenv("ASYNC_DATABASE_URL", "")
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: int = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    
+    # JWT settings
+    SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key")
+    ALGORITHM: str = "HS256"
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    
+    # ML model settings
+    MODEL_PATH: str = os.getenv("MODEL_PATH", "model/fraud_model.joblib")
+    # Start with an untrained model when no artifact exists yet (development only)
+    ALLOW_UNTRAINED_MODEL: bool = False
+    # "sklearn" or "flat" (trees flattened into memory-mapped NumPy arrays)
+    INFERENCE_ENGINE: str = os.getenv("INFERENCE_ENGINE", "sklearn")
+    
+    # Analysis settings
+    MAX_BATCH_SIZE: int = 1000
+    WARM_UP_ON_STARTUP: bool = True
+    # "tokenizer" (default), "regex" (no spaCy) or "spacy" (full pipeline)
+    GRAMMAR_MODE: str = os.getenv("GRAMMAR_MODE", "tokenizer")
+    # Optional keyword lists, one term per line (built-in lists are used when unset)
+    FRAUD_KEYWORDS_PATH: str = os.getenv("FRAUD_KEYWORDS_PATH", "")
+    URGENCY_PHRASES_PATH: str = os.getenv("URGENCY_PHRASES_PATH", "")
+    # BeautifulSoup parser; empty means lxml when installed, else html.parser
+    HTML_PARSER: str = os.getenv("HTML_PARSER", "")
+    # Uploads above this size are rejected; uploads are read in chunks of UPLOAD_CHUNK_BYTES
+    MAX_UPLOAD_BYTES: int = 25 * 1024 * 1024
+    UPLOAD_CHUNK_BYTES: int = 64 * 1024
+    # Content beyond these limits is not analyzed and the result is marked truncated (0 means no limit)
+    MAX_BODY_CHARS: int = 1_000_000
+    MAX_EMAIL_PARTS: int = 100
+    MAX_LINKS: int = 500
+    # Comma-separated blocklist files of phishing domains (one per line or hosts-file format)
+    DOMAIN_BLOCKLIST_PATHS: str = os.getenv("DOMAIN_BLOCKLIST_PATHS", "")
+    DOMAIN_CACHE_SIZE: int = 100_000
+    # Tiered scoring: clear-cut emails (links to IPs or blocklisted domains, or an
+    # allowlisted sender that passed DMARC, with clean links) skip NLP features and the model
+    TIERED_SCORING_ENABLED: bool = False
+    # Comma-separated files of trusted sender domains, same format as the blocklists
+    SENDER_ALLOWLIST_PATHS: str = os.getenv("SENDER_ALLOWLIST_PATHS", "")
+    # Per-sender-domain features (history from the emails table, domain age), cached per domain.
+    # History is queried asynchronously by the API before scoring and saved with
+    # each email, so feedback and train_model reuse it; scan_mailbox never queries
+    # it and scores senders as unseen. Only feedback-confirmed verdicts count
+    SENDER_HISTORY_ENABLED: bool = True
+    SENDER_CACHE_SIZE: int = 100_000
+    SENDER_CACHE_TTL_SECONDS: int = 3600
+    # CSV of "domain,YYYY-MM-DD" registration dates for the domain age feature
+    DOMAIN_AGES_PATH: str = os.getenv("DOMAIN_AGES_PATH", "")
+    
+    # Execution backend for parsing and scoring: "inline", "thread" or "process"
+    ANALYSIS_BACKEND: str = os.getenv("ANALYSIS_BACKEND", "inline")
+    ANALYSIS_POOL_SIZE: int = os.cpu_count() or 1
+    # Analyses allowed to wait for a free worker before requests are rejected
+    ANALYSIS_QUEUE_DEPTH: int = 100
+    
+    # Admission control for the analyze endpoints (0 disables each limit). Token
+    # buckets per client and for the whole API worker, in emails per second,
+    # answer 429 and 503 respectively; beyond ADMISSION_MAX_IN_FLIGHT concurrent
+    # analyses requests get 503
+    ADMISSION_CLIENT_RATE: float = 0
+    ADMISSION_CLIENT_BURST: int = 20
+    ADMISSION_GLOBAL_RATE: float = 0
+    ADMISSION_GLOBAL_BURST: int = 100
+    ADMISSION_MAX_IN_FLIGHT: int = 0
+    # Header identifying the client (e.g. an API key set by a gateway); the peer address without one
+    ADMISSION_CLIENT_HEADER: str = os.getenv("ADMISSION_CLIENT_HEADER", "")
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+    # Above this many in-flight analyses, count grammar issues with a regex instead of spaCy
+    DEGRADED_IN_FLIGHT: int = 0
+    
+    # Result cache for repeated email content (0 disables it)
+    RESULT_CACHE_SIZE: int = 10000
+    RESULT_CACHE_TTL_SECONDS: int = 3600
+    
+    # Near-duplicate campaign matching: emails this similar (estimated Jaccard
+    # similarity of their shingled text) to one confirmed as fraud inherit that verdict;
+    # copies of confirmed-legitimate emails are still scored, since their links may differ
+    CAMPAIGN_INDEX_ENABLED: bool = False
+    CAMPAIGN_MATCH_THRESHOLD: float = 0.7
+    # Snapshot written on shutdown and loaded on startup instead of rebuilding from the database
+    CAMPAIGN_INDEX_PATH: str = os.getenv("CAMPAIGN_INDEX_PATH", "")
+    
+    # Background persistence of analysis results
+    WRITE_BEHIND_ENABLED: bool = False
+    WRITE_BEHIND_BATCH_SIZE: int = 500
+    WRITE_BEHIND_FLUSH_SECONDS: float = 1.0
+    
+    # Background retraining from buffered feedback; paused while the served
+    # model was trained offline by scripts/train_model.py, which it would replace
+    RETRAIN_ENABLED: bool = True
+    RETRAIN_MIN_SAMPLES: int = 100
+    RETRAIN_MAX_INTERVAL_SECONDS: int = 3600
+    RETRAIN_CHECK_SECONDS: int = 30
+    RETRAIN_N_JOBS: int = -1
+    
+    # Background analysis jobs (/api/jobs/...); "memory" or "redis" to share status across API workers
+    JOB_BACKEND: str = os.getenv("JOB_BACKEND", "memory")
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    JOB_WORKERS: int = 4
+    # Jobs allowed to wait for a worker before submissions get 429
+    JOB_QUEUE_SIZE: int = 100
+    JOB_RESULT_TTL_SECONDS: int = 3600
+    JOB_RETRY_AFTER_SECONDS: int = 5
+    
+    # Prometheus metrics on /metrics; with ANALYSIS_BACKEND=process also set
+    # PROMETHEUS_MULTIPROC_DIR so worker timings are collected
+    METRICS_ENABLED: bool = True
+    # Add a Server-Timing header with per-stage durations to every response
+    SERVER_TIMING_ENABLED: bool = False
+    
+    class Config:
+        env_file = ".env"
+
+settings = Settings()
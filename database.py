@@ -1,17 +1,105 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from config import settings
-
-SQLALCHEMY_DATABASE_URL = f"postgresql://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}/{settings.DB_NAME}"
-
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+import threading
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+from config import settings
+
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL or f"postgresql://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or f"postgresql+asyncpg://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+
+# Engines are created on first use, at most once each per process
+_engine = None
+_async_engine = None
+_engine_lock = threading.Lock()
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+def _pool_options(url):
+    # SQLite (used for tests) doesn't take the client/server pool settings
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING
+    }
+
+def get_engine():
+    """The process-wide synchronous engine (background writers, scripts)"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(SQLALCHEMY_DATABASE_URL, **_pool_options(SQLALCHEMY_DATABASE_URL))
+                SessionLocal.configure(bind=_engine)
+    return _engine
+
+def get_async_engine():
+    """The process-wide async engine used by the API"""
+    global _async_engine
+    if _async_engine is None:
+        with _engine_lock:
+            if _async_engine is None:
+                _async_engine = create_async_engine(ASYNC_DATABASE_URL, **_pool_options(ASYNC_DATABASE_URL))
+                AsyncSessionLocal.configure(bind=_async_engine)
+    return _async_engine
+
+def create_session():
+    get_engine()
+    return SessionLocal()
+
+def create_async_session():
+    get_async_engine()
+    return AsyncSessionLocal()
+
+async def dispose_engines():
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    if _engine is not None:
+        _engine.dispose()
+
+def missing_column_statements(connection, metadata):
+    """ALTER TABLE statements for model columns that existing tables lack"""
+    inspector = inspect(connection)
+    statements = []
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            statements.append(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(connection.dialect)};")
+            if column.index:
+                statements.append(f"CREATE INDEX ix_{table.name}_{column.name} ON {table.name} ({column.name});")
+    return statements
+
+def check_schema(connection, metadata):
+    """Fail with the statements to run when tables predate columns added to the models.
+
+    create_all only creates missing tables, so without this every query on an
+    older table fails on the first missing column.
+    """
+    statements = missing_column_statements(connection, metadata)
+    if statements:
+        raise RuntimeError(
+            "Database tables are missing columns added since they were created. "
+            "Run these statements (see README.md) and restart:\n" + "\n".join(statements)
+        )
+
+# Dependency
+def get_db():
+    db = create_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Async dependency
+async def get_async_db():
+    async with create_async_session() as db:
+        yield db
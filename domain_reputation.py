@@ -0,0 +1,156 @@
+# backend/app/services/domain_reputation.py
+import re
+import threading
+from functools import lru_cache
+
+# Built-in phishing patterns, matched anywhere in the host name
+DEFAULT_SUSPICIOUS_PATTERNS = (
+    "securityupdate", "verification", "login-verify", "account-update",
+    "secure-login", "customer-support", "billing-update"
+)
+
+# URL shortener domains, matched on the host or any parent domain
+DEFAULT_SHORTENERS = ("bit.ly", "tinyurl.com", "goo.gl", "t.co", "is.gd")
+
+# (is_ip, is_listed, matches_pattern, is_shortener) for links without a host
+_NO_FLAGS = (False, False, False, False)
+
+_IPV4_PATTERN = re.compile(r"^\d+\.\d+\.\d+\.\d+$")
+
+# Host part of an absolute URL: after the scheme and any user info, before port/path
+_HOST_PATTERN = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*://(?:[^@/?#]*@)?(\[[^\]]*\]|[^:/?#]*)")
+
+def load_blocklist(path):
+    """Read domains from a threat feed (or allowlist) file: one per line, or hosts-file lines ("0.0.0.0 example.com")"""
+    domains = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            domain = normalize_host(line.split()[-1])
+            if domain.startswith("*."):
+                domain = domain[2:]
+            if domain:
+                domains.add(domain)
+    return domains
+
+def normalize_host(host):
+    """Lowercase host name without surrounding whitespace or a trailing dot"""
+    return host.strip().rstrip(".").lower()
+
+def host_suffixes(host):
+    """The host and each parent domain: a.b.example.com, b.example.com, example.com, com"""
+    labels = host.split(".")
+    return [".".join(labels[i:]) for i in range(len(labels))]
+
+class _Snapshot:
+    """Immutable lookup tables, swapped as a whole on reload"""
+
+    __slots__ = ("blocked", "allowed", "shorteners", "patterns")
+
+    def __init__(self, blocked, allowed, shorteners, patterns):
+        self.blocked = frozenset(blocked)
+        self.allowed = frozenset(allowed)
+        self.shorteners = frozenset(shorteners)
+        self.patterns = tuple(patterns)
+
+class DomainReputationIndex:
+    """Link reputation from built-in rules and blocklist files, built once and reloadable.
+
+    Domains are kept in hashed sets and looked up by walking the host's
+    suffixes, so the cost per link depends on the number of labels in the
+    host, not on the size of the blocklists. Verdicts are cached per host.
+    """
+
+    def __init__(self, blocklist_paths=(), suspicious_patterns=DEFAULT_SUSPICIOUS_PATTERNS,
+                 shorteners=DEFAULT_SHORTENERS, cache_size=100_000, allowlist_paths=()):
+        self.blocklist_paths = list(blocklist_paths)
+        # Trusted sender domains, used by tiered scoring
+        self.allowlist_paths = list(allowlist_paths)
+        self.suspicious_patterns = suspicious_patterns
+        self.shorteners = shorteners
+        self.cache_size = cache_size
+        self._reload_lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        """Re-read the blocklist files; lookups in progress keep using the old tables"""
+        with self._reload_lock:
+            blocked = set()
+            for path in self.blocklist_paths:
+                blocked |= load_blocklist(path)
+            allowed = set()
+            for path in self.allowlist_paths:
+                allowed |= load_blocklist(path)
+            snapshot = _Snapshot(blocked, allowed, (normalize_host(s) for s in self.shorteners), self.suspicious_patterns)
+
+            # A fresh cache per snapshot so old verdicts can't outlive a reload
+            @lru_cache(maxsize=self.cache_size)
+            def host_flags(host):
+                return self._host_flags(snapshot, host)
+
+            self._snapshot = snapshot
+            self._host_flags_cached = host_flags
+        return self.stats()
+
+    def link_flags(self, url):
+        """(is_ip, is_listed, matches_pattern, is_shortener) for a link's host.
+
+        is_listed means the host or a parent domain is on a blocklist;
+        matches_pattern means only a built-in phishing pattern occurs in it.
+        """
+        match = _HOST_PATTERN.match(url)
+        if not match or not match.group(1):
+            return _NO_FLAGS
+        return self._host_flags_cached(normalize_host(match.group(1)))
+
+    def link_score(self, url):
+        """Suspicion points for one link: 1 for an IP host, else 1 each for a bad domain and a shortener"""
+        is_ip, is_listed, matches_pattern, is_shortener = self.link_flags(url)
+        if is_ip:
+            return 1
+        return (is_listed or matches_pattern) + is_shortener
+
+    def is_blocked(self, host):
+        return self._is_blocked(self._snapshot, normalize_host(host))
+
+    def is_allowlisted(self, domain):
+        """Whether a sender domain or one of its parents is on the allowlist"""
+        snapshot = self._snapshot
+        return bool(domain) and any(suffix in snapshot.allowed for suffix in host_suffixes(normalize_host(domain)))
+
+    def is_shortener(self, host):
+        snapshot = self._snapshot
+        return any(suffix in snapshot.shorteners for suffix in host_suffixes(normalize_host(host)))
+
+    def stats(self):
+        cache_info = self._host_flags_cached.cache_info()
+        return {
+            "blocked_domains": len(self._snapshot.blocked),
+            "allowed_domains": len(self._snapshot.allowed),
+            "blocklists": len(self.blocklist_paths),
+            "cache_size": cache_info.currsize,
+            "cache_hits": cache_info.hits,
+            "cache_misses": cache_info.misses
+        }
+
+    def _host_flags(self, snapshot, host):
+        if _IPV4_PATTERN.match(host):
+            return (True, False, False, False)
+        is_listed = self._is_listed(snapshot, host)
+        return (
+            False,
+            is_listed,
+            not is_listed and self._matches_pattern(snapshot, host),
+            any(suffix in snapshot.shorteners for suffix in host_suffixes(host))
+        )
+
+    def _is_blocked(self, snapshot, host):
+        return self._is_listed(snapshot, host) or self._matches_pattern(snapshot, host)
+
+    def _is_listed(self, snapshot, host):
+        return any(suffix in snapshot.blocked for suffix in host_suffixes(host))
+
+    def _matches_pattern(self, snapshot, host):
+        return any(pattern in host for pattern in snapshot.patterns)
@@ -0,0 +1,41 @@
+# backend/app/services/email_document.py
+from bs4 import BeautifulSoup
+from config import settings
+
+def _default_html_parser():
+    """Use lxml when it is installed, otherwise the stdlib parser"""
+    if settings.HTML_PARSER:
+        return settings.HTML_PARSER
+    try:
+        import lxml  # noqa: F401
+        return "lxml"
+    except ImportError:
+        return "html.parser"
+
+HTML_PARSER = _default_html_parser()
+
+class EmailDocument:
+    """Email body parsed once, shared by link extraction and feature extraction"""
+
+    __slots__ = ("contains_html", "text", "text_lower", "anchors")
+
+    def __init__(self, contains_html, text, anchors):
+        self.contains_html = contains_html
+        self.text = text
+        self.text_lower = text.lower()
+        # (href, anchor text) pairs
+        self.anchors = anchors
+
+    @classmethod
+    def from_body(cls, body, parser=None):
+        """Build the document, parsing the HTML (if any) a single time"""
+        if "<html" not in body.lower():
+            return cls(False, body, [])
+
+        soup = BeautifulSoup(body, parser or HTML_PARSER)
+        anchors = [(a_tag["href"], a_tag.get_text()) for a_tag in soup.find_all("a", href=True)]
+        return cls(True, soup.get_text(), anchors)
+
+    @property
+    def links(self):
+        return [href for href, _ in self.anchors]
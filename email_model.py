@@ -1,48 +1,80 @@
-# backend/app/models/email_model.py
-from sqlalchemy import Boolean, Column, Integer, String, Text, DateTime, Float, ForeignKey
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
-from datetime import datetime
-
-Base = declarative_base()
-
-class User(Base):
-    __tablename__ = "users"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    username = Column(String(50), unique=True, index=True)
-    email = Column(String(100), unique=True, index=True)
-    hashed_password = Column(String(100))
-    is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    
-    emails = relationship("Email", back_populates="user")
-    
-class Email(Base):
-    __tablename__ = "emails"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    sender = Column(String(255))
-    subject = Column(String(255))
-    body = Column(Text)
-    received_date = Column(DateTime)
-    analyzed = Column(Boolean, default=False)
-    fraud_score = Column(Float, default=0.0)
-    is_fraud = Column(Boolean, default=False)
-    analysis_date = Column(DateTime, nullable=True)
-    
-    user = relationship("User", back_populates="emails")
-    indicators = relationship("FraudIndicator", back_populates="email")
-
-class FraudIndicator(Base):
-    __tablename__ = "fraud_indicators"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    email_id = Column(Integer, ForeignKey("emails.id"))
-    indicator_type = Column(String(50))  # e.g., "suspicious_link", "spoofed_sender", etc.
-    description = Column(Text)
-    severity = Column(Integer)  # 1-10
-    evidence = Column(Text, nullable=True)
-    
-    email = relationship("Email", back_populates="indicators")
+# backend/app/models/email_model.py
+from sqlalchemy import Boolean, Column, Integer, String, Text, Date, DateTime, Float, ForeignKey, Index, JSON
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship
+from datetime import datetime
+
+Base = declarative_base()
+
+class User(Base):
+    __tablename__ = "users"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String(50), unique=True, index=True)
+    email = Column(String(100), unique=True, index=True)
+    hashed_password = Column(String(100))
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    emails = relationship("Email", back_populates="user")
+    
+class Email(Base):
+    __tablename__ = "emails"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    sender = Column(String(255))
+    # Lowercased domain of the From address, for per-sender history lookups
+    sender_domain = Column(String(255), index=True)
+    subject = Column(String(255))
+    body = Column(Text)
+    # Authentication-Results header values, top to bottom, so feedback and
+    # training can rebuild the authentication features
+    authentication_results = Column(JSON, nullable=True)
+    # Sender features as scored (history at analysis time), reused for feedback and training
+    sender_features = Column(JSON, nullable=True)
+    received_date = Column(DateTime)
+    analyzed = Column(Boolean, default=False)
+    fraud_score = Column(Float, default=0.0)
+    is_fraud = Column(Boolean, default=False)
+    analysis_date = Column(DateTime, nullable=True)
+    
+    user = relationship("User", back_populates="emails")
+    indicators = relationship("FraudIndicator", back_populates="email")
+    
+    __table_args__ = (
+        # Serves the per-user history listing and its keyset pagination
+        Index("ix_emails_user_id_analysis_date_id", "user_id", "analysis_date", "id"),
+    )
+
+class FraudIndicator(Base):
+    __tablename__ = "fraud_indicators"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    email_id = Column(Integer, ForeignKey("emails.id"), index=True)
+    indicator_type = Column(String(50))  # e.g., "suspicious_link", "spoofed_sender", etc.
+    description = Column(Text)
+    severity = Column(Integer)  # 1-10
+    evidence = Column(Text, nullable=True)
+    
+    email = relationship("Email", back_populates="indicators")
+
+class FeedbackSample(Base):
+    __tablename__ = "feedback_samples"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    email_id = Column(Integer, ForeignKey("emails.id"), index=True)
+    features = Column(JSON)  # Feature vector in FraudClassifier.features order
+    feature_names = Column(JSON, nullable=True)  # That feature list, so rows from another list are left out
+    is_fraud = Column(Boolean)
+    used_in_training = Column(Boolean, default=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class UserDailyStat(Base):
+    __tablename__ = "user_daily_stats"
+    
+    # One counter per user, day and metric, e.g. "analyzed", "fraud", "score:7", "indicator:urgency_language"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    metric = Column(String(80), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
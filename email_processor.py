@@ -1,152 +1,348 @@
-# backend/app/services/email_processor.py
-import re
-import spacy
-from bs4 import BeautifulSoup
-from email.parser import BytesParser
-from email.policy import default
-from urllib.parse import urlparse
-
-class EmailProcessor:
-    def __init__(self):
-        # Load NLP model
-        self.nlp = spacy.load("en_core_web_sm")
-        
-        # Common fraud keywords
-        self.fraud_keywords = [
-            "urgent", "verify", "suspend", "account", "login", "click", "bank", 
-            "update", "confirm", "password", "security", "alert", "unauthorized",
-            "payment", "expires", "immediately", "verify", "information"
-        ]
-        
-        # Known phishing domains
-        self.suspicious_domains = [
-            "securityupdate", "verification", "login-verify", "account-update",
-            "secure-login", "customer-support", "billing-update"
-        ]
-    
-    def parse_email(self, raw_email):
-        """Parse raw email content and extract components"""
-        parser = BytesParser(policy=default)
-        parsed_email = parser.parsebytes(raw_email)
-        
-        # Extract basic headers
-        headers = {
-            "from": parsed_email.get("From", ""),
-            "to": parsed_email.get("To", ""),
-            "subject": parsed_email.get("Subject", ""),
-            "date": parsed_email.get("Date", ""),
-            "message_id": parsed_email.get("Message-ID", "")
-        }
-        
-        # Get email body
-        body = ""
-        if parsed_email.is_multipart():
-            for part in parsed_email.iter_parts():
-                content_type = part.get_content_type()
-                if content_type == "text/plain" or content_type == "text/html":
-                    body += part.get_content()
-        else:
-            body = parsed_email.get_content()
-            
-        # Extract links from HTML content
-        links = []
-        if "<html" in body:
-            soup = BeautifulSoup(body, "html.parser")
-            for a_tag in soup.find_all('a', href=True):
-                links.append(a_tag['href'])
-                
-        return {
-            "headers": headers,
-            "body": body,
-            "links": links
-        }
-    
-    def extract_features(self, parsed_email):
-        """Extract features for fraud detection from parsed email"""
-        features = {}
-        
-        # Header analysis
-        headers = parsed_email["headers"]
-        features["from_domain"] = self._extract_domain(headers.get("from", ""))
-        
-        # Content analysis
-        body = parsed_email["body"]
-        features["body_length"] = len(body)
-        features["contains_html"] = "<html" in body.lower()
-        
-        # Keyword analysis
-        body_text = BeautifulSoup(body, "html.parser").get_text() if features["contains_html"] else body
-        features["fraud_keyword_count"] = sum(1 for keyword in self.fraud_keywords if keyword.lower() in body_text.lower())
-        features["fraud_keyword_ratio"] = features["fraud_keyword_count"] / len(body_text.split()) if body_text else 0
-        
-        # Link analysis
-        links = parsed_email["links"]
-        features["link_count"] = len(links)
-        features["suspicious_links"] = self._analyze_links(links)
-        features["suspicious_link_ratio"] = features["suspicious_links"] / features["link_count"] if features["link_count"] > 0 else 0
-        
-        # Urgency detection
-        features["urgency_score"] = self._detect_urgency(body_text)
-        
-        # Grammar/spelling quality - simplified version
-        features["grammar_mistakes"] = self._count_grammar_issues(body_text)
-        
-        return features
-    
-    def _extract_domain(self, email_address):
-        """Extract domain from email address"""
-        match = re.search(r'@([^@]+)$', email_address)
-        return match.group(1) if match else ""
-    
-    def _analyze_links(self, links):
-        """Analyze links for suspicious patterns"""
-        suspicious_count = 0
-        
-        for link in links:
-            parsed_url = urlparse(link)
-            domain = parsed_url.netloc
-            
-            # Check for IP addresses instead of domains
-            if re.match(r'^\d+\.\d+\.\d+\.\d+$', domain):
-                suspicious_count += 1
-                continue
-                
-            # Check for suspicious domains
-            for suspicious in self.suspicious_domains:
-                if suspicious in domain:
-                    suspicious_count += 1
-                    break
-                    
-            # Check for URL shorteners
-            short_url_services = ["bit.ly", "tinyurl", "goo.gl", "t.co", "is.gd"]
-            if any(service in domain for service in short_url_services):
-                suspicious_count += 1
-                
-            # Check for mismatched text and URL in HTML
-            # (simplified - would need the full HTML context for better analysis)
-                
-        return suspicious_count
-    
-    def _detect_urgency(self, text):
-        """Detect urgent language patterns"""
-        urgency_phrases = [
-            "act now", "immediate action", "urgent", "expires soon",
-            "limited time", "immediately", "as soon as possible",
-            "deadline", "warning", "alert", "time sensitive"
-        ]
-        
-        score = sum(1 for phrase in urgency_phrases if phrase in text.lower())
-        return score
-    
-    def _count_grammar_issues(self, text):
-        """Simple method to count potential grammar issues"""
-        # This is simplified - a real implementation would use a grammar checking library
-        doc = self.nlp(text)
-        
-        # Count multiple consecutive punctuation as a sign of poor quality
-        multiple_punct = len(re.findall(r'[!?]{2,}', text))
-        
-        # Count all-caps words as potential issues
-        all_caps = sum(1 for token in doc if token.is_alpha and token.text.isupper() and len(token.text) > 1)
-        
-        return multiple_punct + all_caps
+# backend/app/services/email_processor.py
+import re
+import threading
+import spacy
+from email.message import Message
+from email.parser import BytesParser
+from email.policy import default
+from email.utils import parseaddr
+from config import settings
+from .domain_reputation import DomainReputationIndex
+from .email_document import EmailDocument
+from .keyword_matcher import KeywordMatcher, load_terms
+from .metrics import timed
+from .sender_cache import NO_SENDER_FEATURES, SenderDomainCache, database_history, load_domain_ages
+
+# Supported ways of counting grammar issues (see _count_grammar_issues)
+GRAMMAR_MODES = ("tokenizer", "regex", "spacy")
+
+# Used by the regex grammar mode, which approximates spaCy's English tokenizer:
+# whitespace-separated chunks lose leading and trailing punctuation (and a
+# possessive 's), then split on the tokenizer's infixes. URLs and email
+# addresses stay whole, as non-alphabetic tokens. The tokenizer's special
+# cases are not reproduced, and all-caps URLs it fails to recognize (then
+# splits on "-" or "/") are kept whole here, so counts can still differ on
+# unusual text (tests/test_grammar_parity.py pins known cases;
+# benchmarks/bench_grammar.py compares the modes on a corpus).
+_CHUNK_PREFIX_PATTERN = re.compile(r"^[^\w@&\-/\\]+")
+_CHUNK_SUFFIX_PATTERN = re.compile(r"(?:['’][sS])?[^\w@&\-/\\$]*$")
+_INFIX_PATTERN = re.compile(
+    r"\.{2,}|…"
+    r"|(?<=[^\W\d_]),(?=[^\W\d_])"
+    r"|(?<=[^\W_])(?:---|--|——|[\-–—~])(?=[^\W\d_])"
+    r"|(?<=[^\W_])[:<>=/](?=[^\W\d_])"
+    r"|(?<=[a-zß-ÿ])\.(?=[A-ZÀ-Þ])"
+)
+_URL_CHUNK_PATTERN = re.compile(r"://|^www\.|@\w+\.", re.IGNORECASE)
+_MULTIPLE_PUNCT_PATTERN = re.compile(r'[!?]{2,}')
+_ADDRESS_DOMAIN_PATTERN = re.compile(r'@([^@]+)$')
+
+# "spf=pass", "dkim=fail", ... in Authentication-Results headers (RFC 8601).
+# Property names like "header.d=" and "dkim-atps=" don't match.
+_AUTH_RESULT_PATTERN = re.compile(r'(?<![\w.-])(spf|dkim|dmarc)\s*=\s*([a-z]+)', re.IGNORECASE)
+
+AUTH_METHODS = ("spf", "dkim", "dmarc")
+
+# Authentication results as model features: 1 passed, -1 failed, 0 not checked or inconclusive
+AUTH_RESULT_SCORES = {"pass": 1, "fail": -1, "softfail": -1, "permerror": -1}
+
+# Common fraud keywords
+DEFAULT_FRAUD_KEYWORDS = [
+    "urgent", "verify", "suspend", "account", "login", "click", "bank", 
+    "update", "confirm", "password", "security", "alert", "unauthorized",
+    "payment", "expires", "immediately", "information"
+]
+
+# Urgent language patterns
+DEFAULT_URGENCY_PHRASES = [
+    "act now", "immediate action", "urgent", "expires soon",
+    "limited time", "immediately", "as soon as possible",
+    "deadline", "warning", "alert", "time sensitive"
+]
+
+# Process-wide registry so every component shares one spaCy pipeline
+_nlp = None
+_processor = None
+_registry_lock = threading.Lock()
+
+def get_nlp():
+    """Return the shared spaCy pipeline, loading it on first use"""
+    global _nlp
+    if _nlp is None:
+        with _registry_lock:
+            if _nlp is None:
+                _nlp = spacy.load("en_core_web_sm")
+    return _nlp
+
+def get_processor():
+    """Return the shared EmailProcessor instance"""
+    global _processor
+    if _processor is None:
+        with _registry_lock:
+            if _processor is None:
+                _processor = EmailProcessor(
+                    grammar_mode=settings.GRAMMAR_MODE,
+                    fraud_keywords=load_terms(settings.FRAUD_KEYWORDS_PATH) if settings.FRAUD_KEYWORDS_PATH else None,
+                    urgency_phrases=load_terms(settings.URGENCY_PHRASES_PATH) if settings.URGENCY_PHRASES_PATH else None,
+                    max_body_chars=settings.MAX_BODY_CHARS,
+                    max_parts=settings.MAX_EMAIL_PARTS,
+                    max_links=settings.MAX_LINKS,
+                    reputation=DomainReputationIndex(
+                        blocklist_paths=_split_paths(settings.DOMAIN_BLOCKLIST_PATHS),
+                        cache_size=settings.DOMAIN_CACHE_SIZE,
+                        allowlist_paths=_split_paths(settings.SENDER_ALLOWLIST_PATHS)
+                    ),
+                    sender_cache=SenderDomainCache(
+                        history_loader=database_history if settings.SENDER_HISTORY_ENABLED else None,
+                        domain_ages=load_domain_ages(settings.DOMAIN_AGES_PATH) if settings.DOMAIN_AGES_PATH else None,
+                        max_size=settings.SENDER_CACHE_SIZE,
+                        ttl_seconds=settings.SENDER_CACHE_TTL_SECONDS
+                    )
+                )
+    return _processor
+
+def _split_paths(paths):
+    return [path.strip() for path in paths.split(",") if path.strip()]
+
+def parse_authentication_results(values):
+    """SPF, DKIM and DMARC results ("pass", "fail", ...) from Authentication-Results headers.
+
+    Headers are given top to bottom; the topmost one was added by the
+    nearest receiving server, so the first result found for a method wins.
+    A message with several DKIM signatures passes if any of them does.
+    """
+    results = {}
+    for value in values:
+        found = {}
+        for method, result in _AUTH_RESULT_PATTERN.findall(value):
+            method, result = method.lower(), result.lower()
+            if method not in found or (method == "dkim" and result == "pass"):
+                found[method] = result
+        for method, result in found.items():
+            results.setdefault(method, result)
+    return results
+
+def _count_caps_words(text):
+    """All-caps alphabetic tokens of two or more letters, without running spaCy"""
+    count = 0
+    for chunk in text.split():
+        # Most chunks are plain words, which need no splitting
+        if chunk.isalpha():
+            if len(chunk) > 1 and chunk.isupper():
+                count += 1
+            continue
+        if chunk.islower() or _URL_CHUNK_PATTERN.search(chunk):
+            continue
+        chunk = _CHUNK_SUFFIX_PATTERN.sub("", _CHUNK_PREFIX_PATTERN.sub("", chunk))
+        for piece in _INFIX_PATTERN.split(chunk):
+            piece = _CHUNK_SUFFIX_PATTERN.sub("", _CHUNK_PREFIX_PATTERN.sub("", piece))
+            if len(piece) > 1 and piece.isalpha() and piece.isupper():
+                count += 1
+    return count
+
+class EmailProcessor:
+    def __init__(self, nlp=None, grammar_mode="tokenizer", fraud_keywords=None, urgency_phrases=None,
+                 max_body_chars=0, max_parts=0, max_links=0, reputation=None, sender_cache=None):
+        if grammar_mode not in GRAMMAR_MODES:
+            raise ValueError(f"Unknown grammar mode: {grammar_mode}")
+        
+        # NLP model is loaded lazily from the shared registry unless one is given
+        self._nlp = nlp
+        self.grammar_mode = grammar_mode
+        
+        # Limits on how much of a message is analyzed (0 means no limit)
+        self.max_body_chars = max_body_chars
+        self.max_parts = max_parts
+        self.max_links = max_links
+        
+        self.fraud_keywords = fraud_keywords or DEFAULT_FRAUD_KEYWORDS
+        self.urgency_phrases = urgency_phrases or DEFAULT_URGENCY_PHRASES
+        
+        # Built once so all keyword and urgency hits come from one scan of the body
+        self.matcher = KeywordMatcher({
+            "fraud": self.fraud_keywords,
+            "urgency": self.urgency_phrases
+        })
+        
+        # Known phishing domains, blocklists and URL shorteners
+        self.reputation = reputation or DomainReputationIndex()
+        
+        # Per-sender-domain history and age; without one every sender looks new
+        self.sender_cache = sender_cache
+        
+        # Set under load (see AdmissionController) to count grammar issues without spaCy
+        self.degraded = False
+    
+    @property
+    def nlp(self):
+        if self._nlp is None:
+            self._nlp = get_nlp()
+        return self._nlp
+    
+    def parse_email(self, raw_email):
+        """Parse raw email content (bytes or an already parsed message) and extract components"""
+        if isinstance(raw_email, Message):
+            return self.parse_message(raw_email)
+        
+        with timed("mime_parse"):
+            parser = BytesParser(policy=default)
+            parsed_email = parser.parsebytes(raw_email)
+        return self.parse_message(parsed_email)
+    
+    def parse_message(self, parsed_email):
+        """Extract components from a parsed email.message.EmailMessage"""
+        # Extract basic headers
+        headers = {
+            "from": parsed_email.get("From", ""),
+            "to": parsed_email.get("To", ""),
+            "subject": parsed_email.get("Subject", ""),
+            "date": parsed_email.get("Date", ""),
+            "message_id": parsed_email.get("Message-ID", ""),
+            "authentication_results": [str(value) for value in parsed_email.get_all("Authentication-Results", [])]
+        }
+        
+        # Get email body
+        with timed("body_extract"):
+            body, truncated = self._extract_body(parsed_email)
+            
+        # Parse the HTML once; links, visible text and lowercased text are reused
+        with timed("html_parse"):
+            document = EmailDocument.from_body(body)
+        links = document.links
+        if self.max_links and len(links) > self.max_links:
+            links = links[:self.max_links]
+            truncated = True
+                
+        return {
+            "headers": headers,
+            "sender_domain": self._extract_domain(headers["from"]),
+            "body": body,
+            "links": links,
+            "document": document,
+            "truncated": truncated
+        }
+    
+    def _extract_body(self, parsed_email):
+        """Join the text parts into one body, returning (body, truncated)"""
+        chunks = []
+        remaining = self.max_body_chars or None
+        truncated = False
+        
+        # Depth-first in document order; an attachment's subparts (e.g. a
+        # forwarded message) are skipped along with it
+        parts = [parsed_email]
+        part_count = 0
+        while parts:
+            part = parts.pop()
+            part_count += 1
+            if self.max_parts and part_count > self.max_parts:
+                truncated = True
+                break
+            
+            # Only the headers are looked at for attachments and non-text
+            # parts; their payloads are never decoded
+            if part.is_attachment():
+                continue
+            if part.is_multipart():
+                parts.extend(reversed(part.get_payload()))
+                continue
+            if part.get_content_type() not in ("text/plain", "text/html"):
+                continue
+            
+            text = part.get_content()
+            if remaining is not None:
+                if len(text) > remaining:
+                    text = text[:remaining]
+                    truncated = True
+                remaining -= len(text)
+            chunks.append(text)
+            
+            if remaining == 0:
+                # Any text parts left over are not analyzed
+                truncated = truncated or bool(parts)
+                break
+        
+        return "".join(chunks), truncated
+    
+    def extract_features(self, parsed_email):
+        """Extract features for fraud detection from parsed email"""
+        features = {}
+        
+        # Header analysis
+        headers = parsed_email["headers"]
+        with timed("features_headers"):
+            features["from_domain"] = parsed_email["sender_domain"]
+            auth_results = parse_authentication_results(headers.get("authentication_results", []))
+            for method in AUTH_METHODS:
+                features[f"{method}_result"] = AUTH_RESULT_SCORES.get(auth_results.get(method), 0)
+            # Looked up by the analyzer before scoring when sender history is
+            # enabled; otherwise only the registration date is known here
+            if "sender_features" in parsed_email:
+                features.update(parsed_email["sender_features"])
+            elif self.sender_cache is not None:
+                features.update(self.sender_cache.features(features["from_domain"]))
+            else:
+                features.update(NO_SENDER_FEATURES)
+        
+        # Content analysis
+        body = parsed_email["body"]
+        document = parsed_email.get("document") or EmailDocument.from_body(body)
+        features["body_length"] = len(body)
+        features["contains_html"] = document.contains_html
+        
+        # Keyword analysis
+        body_text = document.text
+        with timed("features_keywords"):
+            term_counts = self.matcher.count(document.text_lower)
+            features["fraud_keyword_count"] = term_counts["fraud"]
+            # Whitespace-only bodies (e.g. empty pasted text) have no words
+            word_count = len(body_text.split())
+            features["fraud_keyword_ratio"] = features["fraud_keyword_count"] / word_count if word_count else 0
+        
+        # Link analysis
+        links = parsed_email["links"]
+        with timed("features_links"):
+            features["link_count"] = len(links)
+            features["suspicious_links"] = self._analyze_links(links)
+            features["suspicious_link_ratio"] = features["suspicious_links"] / features["link_count"] if features["link_count"] > 0 else 0
+        
+        # Urgency detection
+        features["urgency_score"] = term_counts["urgency"]
+        
+        # Grammar/spelling quality - simplified version
+        with timed("features_grammar"):
+            features["grammar_mistakes"] = self._count_grammar_issues(body_text)
+        
+        return features
+    
+    def _extract_domain(self, email_address):
+        """Extract domain from email address"""
+        # "Name <user@example.com>" headers carry the address in angle brackets
+        _, address = parseaddr(str(email_address))
+        match = _ADDRESS_DOMAIN_PATTERN.search(address)
+        return match.group(1).lower() if match else ""
+    
+    def _analyze_links(self, links):
+        """Analyze links for suspicious patterns"""
+        # IP hosts, known phishing domains and URL shorteners, looked up per host
+        # (simplified - mismatched anchor text and URL isn't checked yet)
+        return sum(self.reputation.link_score(link) for link in links)
+    
+    def _count_grammar_issues(self, text):
+        """Simple method to count potential grammar issues"""
+        # This is simplified - a real implementation would use a grammar checking library
+        
+        # Count multiple consecutive punctuation as a sign of poor quality
+        multiple_punct = len(_MULTIPLE_PUNCT_PATTERN.findall(text))
+        
+        # Count all-caps words as potential issues
+        if self.grammar_mode == "regex" or self.degraded:
+            # No spaCy at all; approximates the tokenizer's word boundaries
+            all_caps = _count_caps_words(text)
+        else:
+            # The tagger, parser and NER don't change tokenization, so the
+            # tokenizer alone gives the same tokens as the full pipeline
+            doc = self.nlp(text) if self.grammar_mode == "spacy" else self.nlp.tokenizer(text)
+            all_caps = sum(1 for token in doc if token.is_alpha and token.text.isupper() and len(token.text) > 1)
+        
+        return multiple_punct + all_caps
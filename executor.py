@@ -0,0 +1,190 @@
+# backend/app/services/executor.py
+import asyncio
+import contextvars
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from .metrics import timed
+
+BACKENDS = ("inline", "thread", "process")
+
+class QueueFullError(Exception):
+    """Raised when more analyses are waiting than the configured queue depth allows"""
+
+def parse_email(processor, classifier, raw_email):
+    return processor.parse_email(raw_email)
+
+def predict(processor, classifier, parsed_email):
+    return classifier.predict(parsed_email)
+
+def parse_batch(processor, classifier, raw_emails):
+    return [processor.parse_email(raw_email) for raw_email in raw_emails]
+
+def predict_batch(processor, classifier, parsed_emails):
+    return classifier.predict_batch(parsed_emails)
+
+def feature_row(processor, classifier, parsed_email):
+    return classifier.feature_row(parsed_email)
+
+def score_email(processor, classifier, raw_email):
+    """Parse and score one raw email"""
+    parsed_email = processor.parse_email(raw_email)
+    return parsed_email, classifier.predict(parsed_email)
+
+def score_batch(processor, classifier, raw_emails):
+    """Parse and score many raw emails with one model call"""
+    parsed_emails = [processor.parse_email(raw_email) for raw_email in raw_emails]
+    return list(zip(parsed_emails, classifier.predict_batch(parsed_emails)))
+
+# Pipeline owned by each process-pool worker, built once by _init_worker
+_worker_processor = None
+_worker_classifier = None
+
+class _SharedFlag:
+    """A bool in shared memory, so the parent process can switch it for every worker"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __bool__(self):
+        return bool(self.value.value)
+
+def _init_worker(model_path, degraded):
+    global _worker_processor, _worker_classifier
+    from .email_processor import get_processor
+    from .ml_classifier import FraudClassifier
+    from .tiered import build_scorer
+
+    _worker_processor = get_processor()
+    _worker_classifier = build_scorer(FraudClassifier(model_path, processor=_worker_processor), _worker_processor)
+    _worker_processor.degraded = _SharedFlag(degraded)
+    # Load the spaCy pipeline now rather than on the first email
+    _worker_processor.nlp
+
+def _worker_ready():
+    return os.getpid()
+
+def _worker_parse_email(raw_email):
+    return parse_email(_worker_processor, _worker_classifier, raw_email)
+
+def _worker_predict(parsed_email):
+    return predict(_worker_processor, _worker_classifier, parsed_email)
+
+def _worker_parse_batch(raw_emails):
+    return parse_batch(_worker_processor, _worker_classifier, raw_emails)
+
+def _worker_predict_batch(parsed_emails):
+    return predict_batch(_worker_processor, _worker_classifier, parsed_emails)
+
+def _worker_feature_row(parsed_email):
+    return feature_row(_worker_processor, _worker_classifier, parsed_email)
+
+def _worker_score_email(raw_email):
+    return score_email(_worker_processor, _worker_classifier, raw_email)
+
+def _worker_score_batch(raw_emails):
+    return score_batch(_worker_processor, _worker_classifier, raw_emails)
+
+class AnalysisExecutor:
+    """Runs CPU-bound scoring inline, on a thread pool or on a process pool"""
+
+    def __init__(self, processor, classifier, backend="inline", pool_size=None, queue_depth=100, model_path=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown analysis backend: {backend}")
+
+        self.processor = processor
+        self.classifier = classifier
+        self.backend = backend
+        self.pool_size = pool_size or os.cpu_count() or 1
+        self.queue_depth = queue_depth
+        self.model_path = model_path
+        self.pending = 0
+        self._pool = None
+        # Degraded mode for process workers, which have their own processors
+        self._degraded = multiprocessing.Value("b", 0, lock=False)
+
+    def start(self):
+        """Create the pool and wait until every worker has loaded its pipeline"""
+        if self.backend == "inline" or self._pool is not None:
+            return
+
+        self._pool = self._create_pool()
+
+    def restart(self):
+        """Replace process workers so they load the current model from disk"""
+        if self.backend != "process" or self._pool is None:
+            return
+
+        # New workers are ready before the old ones stop, so requests keep flowing
+        old_pool = self._pool
+        self._pool = self._create_pool()
+        old_pool.shutdown(wait=True)
+
+    def _create_pool(self):
+        if self.backend == "thread":
+            return ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="analysis")
+
+        pool = ProcessPoolExecutor(
+            max_workers=self.pool_size,
+            initializer=_init_worker,
+            initargs=(self.model_path, self._degraded)
+        )
+        wait([pool.submit(_worker_ready) for _ in range(self.pool_size)])
+        return pool
+
+    def set_degraded(self, degraded):
+        """Switch the grammar feature to the cheaper regex count on every backend"""
+        self.processor.degraded = degraded
+        self._degraded.value = int(degraded)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def parse_email(self, raw_email):
+        return await self._run(parse_email, _worker_parse_email, raw_email)
+
+    async def predict(self, parsed_email):
+        return await self._run(predict, _worker_predict, parsed_email)
+
+    async def parse_batch(self, raw_emails):
+        return await self._run(parse_batch, _worker_parse_batch, raw_emails)
+
+    async def predict_batch(self, parsed_emails):
+        return await self._run(predict_batch, _worker_predict_batch, parsed_emails)
+
+    async def feature_row(self, parsed_email):
+        return await self._run(feature_row, _worker_feature_row, parsed_email)
+
+    async def score_email(self, raw_email):
+        """Parse and score one email, returning (parsed_email, prediction)"""
+        return await self._run(score_email, _worker_score_email, raw_email)
+
+    async def score_batch(self, raw_emails):
+        """Parse and score a batch of emails, returning (parsed_email, prediction) pairs"""
+        return await self._run(score_batch, _worker_score_batch, raw_emails)
+
+    async def _run(self, func, worker_func, payload):
+        if self.backend == "inline":
+            return func(self.processor, self.classifier, payload)
+
+        # Bound the work waiting on the pool instead of queueing without limit
+        if self.pending >= self.pool_size + self.queue_depth:
+            raise QueueFullError(f"Analysis queue is full ({self.pending} pending)")
+
+        self.start()
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        try:
+            # Includes the wait for a free worker
+            with timed("analysis_pool"):
+                if self.backend == "process":
+                    return await loop.run_in_executor(self._pool, worker_func, payload)
+                # Run in the caller's context so stage timings reach its request
+                context = contextvars.copy_context()
+                return await loop.run_in_executor(
+                    self._pool, context.run, func, self.processor, self.classifier, payload
+                )
+        finally:
+            self.pending -= 1
@@ -0,0 +1,106 @@
+# backend/app/services/forest_engine.py
+import json
+import os
+import numpy as np
+
+class FlatForest:
+    """A fitted random forest flattened into contiguous arrays and evaluated with NumPy.
+
+    All trees live in one set of node arrays. Leaves point back to themselves,
+    so every (row, tree) pair can be walked down in lockstep for max_depth
+    steps without per-tree Python code. Exposes predict_proba like sklearn.
+    """
+
+    ARRAYS = ("feature", "threshold", "children", "leaf_value", "roots")
+
+    # Rows evaluated together; keeps the (rows, trees) working arrays cache-sized
+    BLOCK_SIZE = 1024
+
+    def __init__(self, feature, threshold, children, leaf_value, roots, max_depth, classes):
+        self.feature = feature
+        self.threshold = threshold
+        # Left and right child of node i at children[2 * i] and children[2 * i + 1]
+        self.children = children
+        # Probability of the positive class at each node
+        self.leaf_value = leaf_value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = np.asarray(classes)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        if len(model.classes_) != 2:
+            raise ValueError("FlatForest only supports binary classifiers")
+
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            children.append(np.column_stack([
+                np.where(is_leaf, node_ids, tree.children_left),
+                np.where(is_leaf, node_ids, tree.children_right)
+            ]).ravel() + offset)
+
+            # Same normalization as DecisionTreeClassifier.predict_proba
+            counts = tree.value[:, 0, :]
+            totals = counts.sum(axis=1)
+            totals[totals == 0] = 1
+            values.append(counts[:, 1] / totals)
+
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            np.concatenate(features).astype(np.int32),
+            np.concatenate(thresholds).astype(np.float64),
+            np.concatenate(children).astype(np.int32),
+            np.concatenate(values).astype(np.float64),
+            np.asarray(roots, dtype=np.int32),
+            max_depth,
+            model.classes_
+        )
+
+    def predict_proba(self, X):
+        # sklearn compares float32 inputs against float64 thresholds; do the same
+        X = np.asarray(X, dtype=np.float32)
+        positive = np.empty(X.shape[0])
+        for start in range(0, X.shape[0], self.BLOCK_SIZE):
+            positive[start:start + self.BLOCK_SIZE] = self._positive_proba(X[start:start + self.BLOCK_SIZE])
+        return np.column_stack([1 - positive, positive])
+
+    def _positive_proba(self, X):
+        values = X.ravel()
+        row_offsets = (np.arange(X.shape[0], dtype=np.int32) * X.shape[1])[:, None]
+        nodes = np.repeat(self.roots[None, :], X.shape[0], axis=0)
+
+        for _ in range(self.max_depth):
+            go_right = values[row_offsets + self.feature[nodes]] > self.threshold[nodes]
+            nodes = self.children[nodes * 2 + go_right]
+
+        return self.leaf_value[nodes].mean(axis=1)
+
+    def save(self, directory):
+        """Write each array as a separate .npy so it can be memory-mapped"""
+        os.makedirs(directory, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({"max_depth": self.max_depth, "classes": self.classes_.tolist()}, f)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Load the arrays, memory-mapped so worker processes share them via the page cache"""
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None)
+            for name in cls.ARRAYS
+        }
+        return cls(max_depth=meta["max_depth"], classes=meta["classes"], **arrays)
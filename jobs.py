@@ -0,0 +1,155 @@
+# backend/app/services/jobs.py
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+JOB_BACKENDS = ("memory", "redis")
+
+class JobQueueFullError(Exception):
+    """Raised when more jobs are waiting than the queue allows"""
+
+class InMemoryJobStore:
+    """Job records in a dict, dropped result_ttl seconds after the job finishes"""
+
+    def __init__(self, result_ttl=3600):
+        self.result_ttl = result_ttl
+        # Insertion order is submission order, so expired jobs collect at the front
+        self._jobs = OrderedDict()
+
+    async def create(self, job):
+        self._purge()
+        self._jobs[job["id"]] = {**job, "expires_at": None}
+
+    async def update(self, job_id, **fields):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job.update(fields)
+        if fields.get("status") in ("done", "failed"):
+            job["expires_at"] = time.monotonic() + self.result_ttl
+
+    async def get(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None or (job["expires_at"] is not None and job["expires_at"] <= time.monotonic()):
+            return None
+        return {key: value for key, value in job.items() if key != "expires_at"}
+
+    def _purge(self):
+        now = time.monotonic()
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            if job["expires_at"] is None or job["expires_at"] > now:
+                break
+            self._jobs.popitem(last=False)
+
+class RedisJobStore:
+    """Job records as JSON in Redis, shared by every API worker.
+
+    Takes any client with the redis.asyncio get/set API, so tests can pass
+    an in-memory stand-in such as fakeredis.
+    """
+
+    def __init__(self, client, result_ttl=3600, prefix="email-fraud:job:"):
+        self.client = client
+        self.result_ttl = result_ttl
+        self.prefix = prefix
+
+    async def create(self, job):
+        await self.client.set(self.prefix + job["id"], json.dumps(job))
+
+    async def update(self, job_id, **fields):
+        job = await self.get(job_id)
+        if job is None:
+            return
+        job.update(fields)
+        ttl = self.result_ttl if fields.get("status") in ("done", "failed") else None
+        await self.client.set(self.prefix + job_id, json.dumps(job), ex=ttl)
+
+    async def get(self, job_id):
+        value = await self.client.get(self.prefix + job_id)
+        return json.loads(value) if value is not None else None
+
+def create_job_store():
+    """The job store selected by JOB_BACKEND"""
+    if settings.JOB_BACKEND not in JOB_BACKENDS:
+        raise ValueError(f"Unknown job backend: {settings.JOB_BACKEND}")
+    if settings.JOB_BACKEND == "redis":
+        # Optional dependency, only needed when jobs are shared through Redis
+        import redis.asyncio as redis
+        return RedisJobStore(redis.from_url(settings.REDIS_URL), settings.JOB_RESULT_TTL_SECONDS)
+    return InMemoryJobStore(settings.JOB_RESULT_TTL_SECONDS)
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+class JobQueue:
+    """Runs submitted analyses on a fixed number of workers behind a bounded queue"""
+
+    def __init__(self, store, workers=4, max_pending=100):
+        self.store = store
+        self.workers = workers
+        self._queue = asyncio.Queue(maxsize=max_pending)
+        # Submissions waiting on the store, each holding a queue slot
+        self._reserved = 0
+        self._tasks = []
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, kind, run):
+        """Queue run (an async callable returning a JSON-serializable result) and return the job"""
+        # The slot is reserved before awaiting the store, so concurrent submits
+        # can't all pass this check and overfill the queue
+        if self._queue.maxsize and self._queue.qsize() + self._reserved >= self._queue.maxsize:
+            raise JobQueueFullError(f"Job queue is full ({self._queue.qsize()} waiting)")
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": "queued",
+            "created_at": _now(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+            "result": None
+        }
+        self._reserved += 1
+        try:
+            await self.store.create(job)
+        finally:
+            self._reserved -= 1
+        self._queue.put_nowait((job["id"], run))
+        return job
+
+    async def get(self, job_id):
+        return await self.store.get(job_id)
+
+    async def _work(self):
+        while True:
+            job_id, run = await self._queue.get()
+            try:
+                await self.store.update(job_id, status="running", started_at=_now())
+                result = await run()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Job %s failed", job_id)
+                await self.store.update(job_id, status="failed", finished_at=_now(), error=str(e))
+            else:
+                await self.store.update(job_id, status="done", finished_at=_now(), result=result)
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,85 @@
+# backend/app/services/keyword_matcher.py
+import re
+
+# Below this many terms, one substring check per term on the lowercased text
+# is faster than walking the trie regex at every position of the text
+DIRECT_SCAN_MAX_TERMS = 256
+
+class KeywordMatcher:
+    """Find keywords and phrases from several term lists in a single scan"""
+
+    def __init__(self, terms_by_category):
+        # Map each (lowercased, de-duplicated) term to the categories it belongs to
+        self.term_categories = {}
+        for category, terms in terms_by_category.items():
+            for term in terms:
+                term = term.strip().lower()
+                if term:
+                    self.term_categories.setdefault(term, set()).add(category)
+        self.categories = list(terms_by_category)
+
+        self._pattern = None
+        if len(self.term_categories) <= DIRECT_SCAN_MAX_TERMS:
+            return
+
+        trie = _build_trie(self.term_categories)
+
+        # The alternation is shaped like a trie so each position only follows
+        # the branches that match, independent of how many terms are loaded.
+        # The lookahead lets overlapping matches be reported at every position.
+        self._pattern = re.compile("(?=(" + _trie_pattern(trie) + "))")
+
+        # The regex reports the longest term starting at each position; shorter
+        # terms that are prefixes of it are recovered from this table
+        self._prefix_terms = {term: _prefix_terms(trie, term) for term in self.term_categories}
+
+    def find(self, text):
+        """Return the set of distinct terms found in already-lowercased text"""
+        if self._pattern is None:
+            return set(term for term in self.term_categories if term in text)
+
+        found = set()
+        for longest in set(match.group(1) for match in self._pattern.finditer(text)):
+            found.update(self._prefix_terms[longest])
+        return found
+
+    def count(self, text):
+        """Return the number of distinct terms found per category"""
+        counts = dict.fromkeys(self.categories, 0)
+        for term in self.find(text):
+            for category in self.term_categories[term]:
+                counts[category] += 1
+        return counts
+
+def load_terms(path):
+    """Load one term per line from a file, skipping blanks and # comments"""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+def _build_trie(terms):
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = True  # End of a term
+    return trie
+
+def _trie_pattern(node):
+    """Convert a trie to a regex that prefers the longest match"""
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ""
+    pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    # A term may end here, so the rest is optional (greedy, so longer terms win)
+    return "(?:" + pattern + ")?" if "" in node else pattern
+
+def _prefix_terms(trie, term):
+    """All terms that are prefixes of the given term (including itself)"""
+    prefixes = []
+    node = trie
+    for i, char in enumerate(term):
+        node = node[char]
+        if "" in node:
+            prefixes.append(term[:i + 1])
+    return prefixes
@@ -1,31 +1,77 @@
-# backend/app/main.py
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from .routes import api
-from .models.email_model import Base
-from sqlalchemy import create_engine
-from config import settings
-
-app = FastAPI(title="Email Fraud Detection API", version="1.0.0")
-
-# Set up CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # In production, replace with specific origins
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Include routers
-app.include_router(api.router, prefix="/api", tags=["Email Analysis"])
-
-# Create database tables on startup
-@app.on_event("startup")
-async def startup():
-    engine = create_engine(f"postgresql://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}/{settings.DB_NAME}")
-    Base.metadata.create_all(bind=engine)
-
-@app.get("/")
-async def root():
-    return {"message": "Email Fraud Detection API is running"}
+# backend/app/main.py
+from fastapi import FastAPI, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+from .routes import api
+from .models.email_model import Base
+from .database import check_schema, dispose_engines, get_async_engine
+from .services import metrics
+from config import settings
+
+app = FastAPI(title="Email Fraud Detection API", version="1.0.0")
+
+# Set up CORS
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # In production, replace with specific origins
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Include routers
+app.include_router(api.router, prefix="/api", tags=["Email Analysis"])
+
+# Report per-stage durations of each request
+if settings.METRICS_ENABLED and settings.SERVER_TIMING_ENABLED:
+    @app.middleware("http")
+    async def server_timing(request: Request, call_next):
+        timings = metrics.start_request_timing()
+        response = await call_next(request)
+        if timings:
+            response.headers["Server-Timing"] = metrics.server_timing_header(timings)
+        return response
+
+# Create database tables on startup
+@app.on_event("startup")
+async def startup():
+    # Reuse the process-wide engine instead of creating another one
+    async with get_async_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        # Existing tables aren't altered by create_all; refuse to start on an old schema
+        await conn.run_sync(check_schema, Base.metadata)
+
+# Load models before serving so the first request doesn't pay for it
+@app.on_event("startup")
+async def warm_up_models():
+    if settings.WARM_UP_ON_STARTUP:
+        app.state.warm_up_stats = api.analyzer.warm_up()
+    await api.analyzer.load_campaigns()
+    # Start the analysis pool (process workers preload their own pipeline)
+    api.analyzer.executor.start()
+    if settings.RETRAIN_ENABLED:
+        api.analyzer.retraining.start()
+    api.jobs.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await api.jobs.stop()
+    await api.analyzer.retraining.stop()
+    api.analyzer.executor.shutdown()
+    if api.analyzer.write_behind is not None:
+        api.analyzer.write_behind.stop()
+    api.analyzer.save_campaigns()
+    await dispose_engines()
+
+@app.get("/")
+async def root():
+    return {"message": "Email Fraud Detection API is running"}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/health/startup")
+async def startup_stats():
+    """Report cold-start time and memory measured during warm-up"""
+    return getattr(app.state, "warm_up_stats", {})
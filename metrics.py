@@ -0,0 +1,120 @@
+# backend/app/services/metrics.py
+import os
+import time
+from contextvars import ContextVar
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from config import settings
+
+ENABLED = settings.METRICS_ENABLED
+
+# From half a millisecond (header parsing) up to seconds (large HTML, slow database)
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_SECONDS = Histogram(
+    "email_analysis_stage_seconds",
+    "Time spent in each stage of email analysis",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+VERDICTS = Counter("email_verdicts_total", "Analyzed emails by verdict", ["verdict"])
+INDICATORS = Counter("email_indicators_total", "Fraud indicators raised, by type", ["type"])
+TIER_DECISIONS = Counter("email_tier_decisions_total", "Verdicts by the scoring tier that decided them", ["tier"])
+SENDER_CACHE_LOOKUPS = Counter("email_sender_cache_lookups_total", "Sender-domain feature lookups, by cache result", ["result"])
+ADMISSIONS = Counter("email_admission_decisions_total", "Analysis requests admitted, or rejected by limit", ["decision"])
+# Summed over API worker processes when PROMETHEUS_MULTIPROC_DIR is set
+IN_FLIGHT = Gauge("email_admission_in_flight", "Analyses in progress", multiprocess_mode="livesum")
+DEGRADED = Gauge("email_admission_degraded", "1 while analyses skip the spaCy grammar feature", multiprocess_mode="livemax")
+# 1 for the model version being served; 1 in any live process wins, so a rollout shows both versions
+MODEL_VERSION = Gauge("email_model_version_info", "Model version serving predictions", ["version"], multiprocess_mode="livemax")
+
+# Version last reported by this process, set back to 0 when another is swapped in
+_served_version = None
+
+# Stage durations of the current request, reported in the Server-Timing header
+_request_timings = ContextVar("request_timings", default=None)
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class _StageTimer:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.labels(self.stage).observe(elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[self.stage] = timings.get(self.stage, 0.0) + elapsed
+        return False
+
+def timed(stage):
+    """Time a block as an analysis stage; a shared no-op when metrics are disabled"""
+    if not ENABLED:
+        return _NULL_TIMER
+    return _StageTimer(stage)
+
+def record_prediction(prediction):
+    """Count the verdict and indicator types of one analyzed email"""
+    if not ENABLED:
+        return
+    VERDICTS.labels("fraud" if prediction["is_fraud"] else "not_fraud").inc()
+    for indicator in prediction["indicators"]:
+        INDICATORS.labels(indicator["type"]).inc()
+    if "decided_by" in prediction:
+        TIER_DECISIONS.labels(prediction["decided_by"]).inc()
+
+def record_sender_cache_lookup(hit):
+    if ENABLED:
+        SENDER_CACHE_LOOKUPS.labels("hit" if hit else "miss").inc()
+
+def record_admission(decision, in_flight, degraded):
+    """Count an admission decision (None for a release) and update the limiter gauges"""
+    if not ENABLED:
+        return
+    if decision is not None:
+        ADMISSIONS.labels(decision).inc()
+    IN_FLIGHT.set(in_flight)
+    DEGRADED.set(1 if degraded else 0)
+
+def record_model_version(version):
+    global _served_version
+    if not ENABLED:
+        return
+    # Every unsaved model gets a new version; one label keeps the series count bounded
+    if version.startswith("unsaved-"):
+        version = "unsaved"
+    if _served_version is not None and _served_version != version:
+        MODEL_VERSION.labels(_served_version).set(0)
+    MODEL_VERSION.labels(version).set(1)
+    _served_version = version
+
+def start_request_timing():
+    """Collect stage timings for the current request into the returned dict"""
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+def server_timing_header(timings):
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings.items())
+
+def render():
+    """All metrics in the Prometheus text format, returning (body, content type)"""
+    # Process-pool workers write their samples to PROMETHEUS_MULTIPROC_DIR
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
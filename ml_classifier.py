@@ -1,135 +1,215 @@
-# backend/app/services/ml_classifier.py
-import pickle
-import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from .email_processor import EmailProcessor
-
-class FraudClassifier:
-    def __init__(self, model_path=None):
-        self.processor = EmailProcessor()
-        
-        # Load pre-trained model if available
-        if model_path:
-            try:
-                with open(model_path, 'rb') as f:
-                    self.model = pickle.load(f)
-            except:
-                # If model loading fails, create a new one
-                self.model = self._create_model()
-        else:
-            # Create a new model
-            self.model = self._create_model()
-            
-        # Feature list for the model
-        self.features = [
-            'body_length', 'contains_html', 'fraud_keyword_count', 
-            'fraud_keyword_ratio', 'link_count', 'suspicious_links',
-            'suspicious_link_ratio', 'urgency_score', 'grammar_mistakes'
-        ]
-            
-    def _create_model(self):
-        """Create a new fraud detection model"""
-        # In a real implementation, you would train this on historical data
-        # For now, we'll initialize with default parameters
-        return RandomForestClassifier(
-            n_estimators=100,
-            max_depth=10,
-            random_state=42
-        )
-    
-    def predict(self, parsed_email):
-        """Predict fraud probability for an email"""
-        # Extract features
-        features = self.processor.extract_features(parsed_email)
-        
-        # Convert to feature vector
-        feature_vector = np.array([[
-            features['body_length'],
-            1 if features['contains_html'] else 0,
-            features['fraud_keyword_count'],
-            features['fraud_keyword_ratio'],
-            features['link_count'],
-            features['suspicious_links'],
-            features['suspicious_link_ratio'],
-            features['urgency_score'],
-            features['grammar_mistakes']
-        ]])
-        
-        # Make prediction
-        fraud_probability = self.model.predict_proba(feature_vector)[0, 1]
-        
-        # Generate explanation for indicators
-        indicators = self._generate_indicators(features, fraud_probability)
-        
-        return {
-            'fraud_probability': float(fraud_probability),
-            'is_fraud': fraud_probability > 0.7,  # Threshold can be adjusted
-            'indicators': indicators
-        }
-    
-    def _generate_indicators(self, features, fraud_probability):
-        """Generate human-readable fraud indicators"""
-        indicators = []
-        
-        # High number of suspicious links
-        if features['suspicious_link_ratio'] > 0.5 and features['link_count'] > 0:
-            indicators.append({
-                'type': 'suspicious_links',
-                'description': f"Contains suspicious links ({features['suspicious_links']} out of {features['link_count']})",
-                'severity': min(10, int(features['suspicious_link_ratio'] * 10) + 5)
-            })
-            
-        # High urgency language
-        if features['urgency_score'] > 2:
-            indicators.append({
-                'type': 'urgency_language',
-                'description': f"Contains urgent or time-sensitive language (score: {features['urgency_score']})",
-                'severity': min(8, features['urgency_score'] * 2)
-            })
-            
-        # Suspicious keywords
-        if features['fraud_keyword_ratio'] > 0.05:
-            indicators.append({
-                'type': 'suspicious_keywords',
-                'description': f"Contains suspicious keywords ({features['fraud_keyword_count']} instances)",
-                'severity': min(7, int(features['fraud_keyword_ratio'] * 100))
-            })
-            
-        # Poor grammar/spelling quality
-        if features['grammar_mistakes'] > 5:
-            indicators.append({
-                'type': 'poor_quality',
-                'description': f"Contains grammatical issues or unusual formatting",
-                'severity': min(6, features['grammar_mistakes'] // 2)
-            })
-            
-        return indicators
-    
-    def update_model(self, email_data, is_fraud):
-        """Update model with new labeled data (for feedback loop)"""
-        # This would be expanded in a real implementation
-        # Simplified version for demonstration purposes
-        features = self.processor.extract_features(email_data)
-        
-        # Extract feature vector
-        X = np.array([[
-            features['body_length'],
-            1 if features['contains_html'] else 0,
-            features['fraud_keyword_count'],
-            features['fraud_keyword_ratio'],
-            features['link_count'],
-            features['suspicious_links'],
-            features['suspicious_link_ratio'],
-            features['urgency_score'],
-            features['grammar_mistakes']
-        ]])
-        
-        y = np.array([1 if is_fraud else 0])
-        
-        # Partial fit (in real implementation, you'd accumulate data and retrain)
-        self.model.fit(X, y)
-        
-    def save_model(self, model_path):
-        """Save the current model to disk"""
-        with open(model_path, 'wb') as f:
-            pickle.dump(self.model, f)
+# backend/app/services/ml_classifier.py
+import os
+import threading
+import time
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from .email_processor import AUTH_METHODS, get_processor
+from .forest_engine import FlatForest
+from .metrics import record_model_version, timed
+from .model_store import load_artifact, manifest_path, save_artifact
+from config import settings
+
+# Feature list for newly trained models; loaded models use their manifest's list
+FEATURES = [
+    'body_length', 'contains_html', 'fraud_keyword_count', 
+    'fraud_keyword_ratio', 'link_count', 'suspicious_links',
+    'suspicious_link_ratio', 'urgency_score', 'grammar_mistakes',
+    'spf_result', 'dkim_result', 'dmarc_result',
+    'sender_history_days', 'sender_fraud_rate', 'sender_domain_age_days'
+]
+
+DEFAULT_THRESHOLD = 0.7
+
+INFERENCE_ENGINES = ("sklearn", "flat")
+
+class FraudClassifier:
+    def __init__(self, model_path=None, processor=None, allow_untrained=None, engine=None):
+        self.processor = processor or get_processor()
+        self.model_path = model_path
+        self.engine = engine or settings.INFERENCE_ENGINE
+        if self.engine not in INFERENCE_ENGINES:
+            raise ValueError(f"Unknown inference engine {self.engine!r}, expected one of {INFERENCE_ENGINES}")
+        self._manifest_mtime = None
+        self._swap_lock = threading.Lock()
+        
+        if allow_untrained is None:
+            allow_untrained = settings.ALLOW_UNTRAINED_MODEL
+        
+        # Load the pre-trained model; a broken artifact fails startup instead of every request
+        if model_path and (os.path.exists(manifest_path(model_path)) or not allow_untrained):
+            model, manifest = load_artifact(model_path, engine=self.engine)
+            self._manifest_mtime = os.path.getmtime(manifest_path(model_path))
+            self._set_model(model, manifest)
+        else:
+            # Untrained model, only usable once feedback retraining has produced one
+            self._set_model(self._create_model(), None)
+            
+    def _create_model(self, n_jobs=None):
+        """Create a new fraud detection model"""
+        # In a real implementation, you would train this on historical data
+        # For now, we'll initialize with default parameters
+        return RandomForestClassifier(
+            n_estimators=100,
+            max_depth=10,
+            random_state=42,
+            n_jobs=n_jobs
+        )
+    
+    def predict(self, parsed_email):
+        """Predict fraud probability for an email"""
+        # Extract features
+        features = self.processor.extract_features(parsed_email)
+        
+        # Convert to feature vector
+        feature_vector = np.array([self._feature_vector(features)])
+        
+        # Make prediction (self.model may be swapped by retraining at any time)
+        with timed("model"):
+            fraud_probability = self.model.predict_proba(feature_vector)[0, 1]
+        
+        return self._build_prediction(features, fraud_probability)
+    
+    def predict_batch(self, parsed_emails):
+        """Predict fraud probabilities for many emails with a single model call"""
+        if not parsed_emails:
+            return []
+        
+        # Extract features for every email and stack them into one (N, features) matrix
+        features_list = [self.processor.extract_features(parsed_email) for parsed_email in parsed_emails]
+        feature_matrix = np.array([self._feature_vector(features) for features in features_list])
+        
+        # One predict_proba call for the whole batch
+        with timed("model"):
+            fraud_probabilities = self.model.predict_proba(feature_matrix)[:, 1]
+        
+        return [
+            self._build_prediction(features, fraud_probability)
+            for features, fraud_probability in zip(features_list, fraud_probabilities)
+        ]
+    
+    def _feature_vector(self, features):
+        """Convert extracted features to a model input row, in the model's feature order"""
+        return [float(features[name]) for name in self.features]
+    
+    def _build_prediction(self, features, fraud_probability):
+        """Build the prediction result for a single email"""
+        # Generate explanation for indicators
+        indicators = self._generate_indicators(features, fraud_probability)
+        
+        return {
+            'fraud_probability': float(fraud_probability),
+            'is_fraud': bool(fraud_probability > self.threshold),
+            'indicators': indicators,
+            'model_version': self.version
+        }
+    
+    def _generate_indicators(self, features, fraud_probability):
+        """Generate human-readable fraud indicators"""
+        indicators = []
+        
+        # High number of suspicious links
+        if features['suspicious_link_ratio'] > 0.5 and features['link_count'] > 0:
+            indicators.append({
+                'type': 'suspicious_links',
+                'description': f"Contains suspicious links ({features['suspicious_links']} out of {features['link_count']})",
+                'severity': min(10, int(features['suspicious_link_ratio'] * 10) + 5)
+            })
+            
+        # High urgency language
+        if features['urgency_score'] > 2:
+            indicators.append({
+                'type': 'urgency_language',
+                'description': f"Contains urgent or time-sensitive language (score: {features['urgency_score']})",
+                'severity': min(8, features['urgency_score'] * 2)
+            })
+            
+        # Suspicious keywords
+        if features['fraud_keyword_ratio'] > 0.05:
+            indicators.append({
+                'type': 'suspicious_keywords',
+                'description': f"Contains suspicious keywords ({features['fraud_keyword_count']} instances)",
+                'severity': min(7, int(features['fraud_keyword_ratio'] * 100))
+            })
+            
+        # Sender failed SPF, DKIM or DMARC at the receiving server
+        failed_checks = [method.upper() for method in AUTH_METHODS if features[f'{method}_result'] < 0]
+        if failed_checks:
+            indicators.append({
+                'type': 'failed_authentication',
+                'description': f"Sender failed {', '.join(failed_checks)} authentication",
+                'severity': 8 if 'DMARC' in failed_checks else 6
+            })
+            
+        # Poor grammar/spelling quality
+        if features['grammar_mistakes'] > 5:
+            indicators.append({
+                'type': 'poor_quality',
+                'description': f"Contains grammatical issues or unusual formatting",
+                'severity': min(6, features['grammar_mistakes'] // 2)
+            })
+            
+        return indicators
+    
+    def feature_row(self, parsed_email):
+        """Feature vector for an email, as stored for retraining"""
+        return self._feature_vector(self.processor.extract_features(parsed_email))
+    
+    def fit_model(self, X, y, n_jobs=-1):
+        """Train a new model on labeled feature rows without touching the live one"""
+        y = np.asarray(y)
+        if len(np.unique(y)) < 2:
+            raise ValueError("Training data must contain both fraud and legitimate examples")
+        
+        model = self._create_model(n_jobs=n_jobs)
+        model.fit(np.asarray(X, dtype=float), y)
+        return model
+    
+    def swap_model(self, model, manifest=None):
+        """Atomically replace the live model"""
+        with self._swap_lock:
+            self._set_model(model, manifest)
+    
+    def publish_model(self, model, metadata=None):
+        """Save a newly trained model as a versioned artifact and swap it in"""
+        manifest = None
+        if self.model_path:
+            manifest = save_artifact(model, self.model_path, self.features, self.threshold, metadata)
+            self._manifest_mtime = os.path.getmtime(manifest_path(self.model_path))
+        self.swap_model(model, manifest)
+        return manifest
+    
+    def reload_if_changed(self):
+        """Load the model artifact again if another process has published a new one"""
+        if not self.model_path or not os.path.exists(manifest_path(self.model_path)):
+            return False
+        
+        mtime = os.path.getmtime(manifest_path(self.model_path))
+        if mtime == self._manifest_mtime:
+            return False
+        
+        model, manifest = load_artifact(self.model_path, engine=self.engine)
+        self._manifest_mtime = mtime
+        self.swap_model(model, manifest)
+        return True
+        
+    def save_model(self, model_path, metadata=None):
+        """Save the current model to disk as a versioned artifact"""
+        return save_artifact(self.model, model_path, self.features, self.threshold, metadata)
+    
+    def _set_model(self, model, manifest):
+        # Freshly trained forests are flattened too; an unfitted model has nothing to flatten
+        if self.engine == "flat" and hasattr(model, "estimators_"):
+            model = FlatForest.from_sklearn(model)
+        self.model = model
+        self.manifest = manifest
+        if manifest:
+            self.features = manifest["features"]
+            self.threshold = manifest["threshold"]
+            self.version = manifest["version"]
+        else:
+            self.features = list(FEATURES)
+            self.threshold = getattr(self, "threshold", DEFAULT_THRESHOLD)
+            # Still changes on every swap so cached results are invalidated
+            self.version = f"unsaved-{time.time_ns()}"
+        record_model_version(self.version)
@@ -0,0 +1,125 @@
+# backend/app/services/model_store.py
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+import joblib
+from .forest_engine import FlatForest
+
+MANIFEST_SUFFIX = ".manifest.json"
+FLAT_SUFFIX = ".flat"
+
+class ModelLoadError(Exception):
+    """Raised when a model artifact is missing, corrupt or inconsistent"""
+
+def manifest_path(model_path):
+    return model_path + MANIFEST_SUFFIX
+
+def save_artifact(model, model_path, features, threshold, metadata=None):
+    """Write the model and its manifest, returning the manifest"""
+    os.makedirs(os.path.dirname(model_path) or ".", exist_ok=True)
+
+    # Uncompressed so NumPy arrays in the file can be memory-mapped on load
+    tmp_model_path = model_path + ".tmp"
+    joblib.dump(model, tmp_model_path, compress=0)
+    checksum = _sha256(tmp_model_path)
+
+    created_at = datetime.now(timezone.utc)
+    version = f"{created_at.strftime('%Y%m%d%H%M%S')}-{checksum[:8]}"
+    manifest = {
+        "version": version,
+        "created_at": created_at.isoformat(),
+        "format": "joblib",
+        "features": list(features),
+        "threshold": threshold,
+        "checksum": checksum,
+        "training": metadata or {}
+    }
+
+    # Flattened trees for the "flat" inference engine, in a directory per version
+    # so processes still mapping the previous arrays are unaffected
+    if hasattr(model, "estimators_"):
+        flat_dir = f"{model_path}.{version}{FLAT_SUFFIX}"
+        FlatForest.from_sklearn(model).save(flat_dir)
+        manifest["flat_forest"] = os.path.basename(flat_dir)
+        manifest["flat_checksum"] = _sha256_dir(flat_dir)
+    tmp_manifest_path = manifest_path(model_path) + ".tmp"
+    with open(tmp_manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Model first, manifest last: readers key off the manifest and verify the checksum
+    os.replace(tmp_model_path, model_path)
+    os.replace(tmp_manifest_path, manifest_path(model_path))
+    _remove_stale_flat_dirs(model_path, manifest.get("flat_forest"))
+    return manifest
+
+def load_manifest(model_path):
+    try:
+        with open(manifest_path(model_path)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise ModelLoadError(f"No model manifest at {manifest_path(model_path)}")
+    except ValueError as e:
+        raise ModelLoadError(f"Invalid model manifest: {e}")
+
+    missing = {"version", "features", "threshold", "checksum"} - set(manifest)
+    if missing:
+        raise ModelLoadError(f"Model manifest is missing {sorted(missing)}")
+    return manifest
+
+def load_artifact(model_path, mmap=True, engine="sklearn"):
+    """Load and verify a model artifact, returning (model, manifest)"""
+    manifest = load_manifest(model_path)
+    # Manifests without a flat_checksum can't vouch for their flattened
+    # arrays, so those are rebuilt from the verified joblib file below
+    if engine == "flat" and manifest.get("flat_forest") and manifest.get("flat_checksum"):
+        flat_dir = os.path.join(os.path.dirname(model_path), manifest["flat_forest"])
+        try:
+            if _sha256_dir(flat_dir) != manifest["flat_checksum"]:
+                raise ModelLoadError(f"Checksum mismatch for {flat_dir}")
+            return FlatForest.load(flat_dir, mmap=mmap), manifest
+        except (OSError, ValueError, KeyError) as e:
+            raise ModelLoadError(f"Could not load flattened model from {flat_dir}: {e}")
+
+    if not os.path.exists(model_path):
+        raise ModelLoadError(f"Model file {model_path} is missing")
+    if _sha256(model_path) != manifest["checksum"]:
+        raise ModelLoadError(f"Checksum mismatch for {model_path}")
+
+    try:
+        # Arrays stay backed by the file, so workers loading the same
+        # artifact read them through the shared OS page cache
+        model = joblib.load(model_path, mmap_mode="r" if mmap else None)
+    except Exception as e:
+        raise ModelLoadError(f"Could not load model from {model_path}: {e}")
+    if engine == "flat":
+        # Artifact saved before flattening existed
+        model = FlatForest.from_sklearn(model)
+    return model, manifest
+
+def _remove_stale_flat_dirs(model_path, keep):
+    directory = os.path.dirname(model_path) or "."
+    prefix = os.path.basename(model_path) + "."
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name.endswith(FLAT_SUFFIX) and name != keep:
+            # Open memory maps keep the removed files alive until they are closed
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    _update_digest(digest, path)
+    return digest.hexdigest()
+
+def _sha256_dir(directory):
+    """Checksum over the names and contents of a directory's files, in name order"""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(directory)):
+        digest.update(name.encode("utf-8") + b"\0")
+        _update_digest(digest, os.path.join(directory, name))
+    return digest.hexdigest()
+
+def _update_digest(digest, path):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
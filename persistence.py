@@ -0,0 +1,149 @@
+# backend/app/services/persistence.py
+import logging
+import queue
+import threading
+from datetime import datetime
+from sqlalchemy import insert
+from ..models.email_model import Email, FraudIndicator
+from .user_stats import record_stat_rows, upsert_stats_statement
+
+logger = logging.getLogger(__name__)
+
+def build_record(user_id, parsed_email, prediction):
+    """Row values for an analyzed email and its indicators"""
+    now = datetime.now()
+    email_row = {
+        "user_id": user_id,
+        "sender": parsed_email["headers"]["from"],
+        "sender_domain": parsed_email["sender_domain"],
+        "subject": parsed_email["headers"]["subject"],
+        "body": parsed_email["body"],
+        "authentication_results": parsed_email["headers"].get("authentication_results", []),
+        "sender_features": parsed_email.get("sender_features"),
+        "received_date": now,  # Or parse the actual date from headers
+        "analyzed": True,
+        "fraud_score": prediction["fraud_probability"],
+        "is_fraud": bool(prediction["is_fraud"]),
+        "analysis_date": now
+    }
+    indicator_rows = [
+        {
+            "indicator_type": indicator["type"],
+            "description": indicator["description"],
+            "severity": indicator["severity"],
+            "evidence": None  # Could add specific evidence in a real system
+        }
+        for indicator in prediction["indicators"]
+    ]
+    return email_row, indicator_rows
+
+def save_records(db, records):
+    """Insert many emails and their indicators in a single transaction, returning the email ids"""
+    if not records:
+        return []
+
+    try:
+        email_ids = db.execute(_email_insert(), [email_row for email_row, _ in records]).scalars().all()
+        indicator_rows = _indicator_rows(email_ids, records)
+        if indicator_rows:
+            db.execute(insert(FraudIndicator), indicator_rows)
+        # Dashboard counters change in the same transaction as the rows they count
+        stat_rows = record_stat_rows(records)
+        if stat_rows:
+            db.execute(upsert_stats_statement(db.get_bind().dialect.name), stat_rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return list(email_ids)
+
+async def save_records_async(db, records):
+    """save_records for an AsyncSession"""
+    if not records:
+        return []
+
+    try:
+        result = await db.execute(_email_insert(), [email_row for email_row, _ in records])
+        email_ids = result.scalars().all()
+        indicator_rows = _indicator_rows(email_ids, records)
+        if indicator_rows:
+            await db.execute(insert(FraudIndicator), indicator_rows)
+        stat_rows = record_stat_rows(records)
+        if stat_rows:
+            await db.execute(upsert_stats_statement(db.get_bind().dialect.name), stat_rows)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+    return list(email_ids)
+
+def _email_insert():
+    # One multi-row INSERT ... RETURNING for the emails, ids in parameter order
+    return insert(Email).returning(Email.id, sort_by_parameter_order=True)
+
+def _indicator_rows(email_ids, records):
+    return [
+        {**indicator_row, "email_id": email_id}
+        for email_id, (_, rows) in zip(email_ids, records)
+        for indicator_row in rows
+    ]
+
+class WriteBehindQueue:
+    """Persists analysis records on a background thread in batches"""
+
+    def __init__(self, session_factory, batch_size=500, flush_interval=1.0, max_size=10000):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_size)
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def submit(self, record):
+        """Queue a record, returning False if the queue is full"""
+        self.start()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            return False
+
+    def stop(self):
+        """Flush everything still queued and stop the writer thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                record = self._queue.get(timeout=self.flush_interval)
+                while record is not None:
+                    batch.append(record)
+                    if len(batch) >= self.batch_size:
+                        break
+                    record = self._queue.get_nowait()
+                stopping = record is None
+            except queue.Empty:
+                pass
+
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        db = self.session_factory()
+        try:
+            save_records(db, batch)
+        except Exception:
+            logger.exception("Failed to persist %d analysis records", len(batch))
+        finally:
+            db.close()
@@ -0,0 +1,74 @@
+# backend/app/services/result_cache.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from .email_processor import AUTH_METHODS, parse_authentication_results
+
+class ResultCache:
+    """Bounded LRU cache of analysis results with a time-to-live"""
+
+    def __init__(self, max_size=10000, ttl_seconds=3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+def content_key(parsed_email, sender_domain, model_version):
+    """Hash of the normalized body, links, sender domain, authentication results, sender features and model version"""
+    digest = hashlib.sha256()
+    # Copies that only differ in whitespace (re-wrapped lines etc.) share a result
+    digest.update(" ".join(parsed_email["body"].split()).encode("utf-8", "surrogatepass"))
+    for link in parsed_email["links"]:
+        digest.update(b"\0" + link.encode("utf-8", "surrogatepass"))
+    digest.update(b"\0" + sender_domain.lower().encode("utf-8", "surrogatepass"))
+    # A spoofed copy (dmarc=fail) must not inherit the verdict of the authenticated one
+    auth_results = parse_authentication_results(parsed_email["headers"].get("authentication_results", []))
+    for method in AUTH_METHODS:
+        digest.update(b"\0" + str(auth_results.get(method)).encode())
+    # Rounded so the history age, which grows with every call, doesn't defeat the cache
+    sender_features = parsed_email.get("sender_features")
+    if sender_features is not None:
+        digest.update(b"\0%d\0%.2f\0%d" % (
+            sender_features["sender_history_days"],
+            sender_features["sender_fraud_rate"],
+            sender_features["sender_domain_age_days"]
+        ))
+    digest.update(b"\0" + str(model_version).encode())
+    return digest.hexdigest()
@@ -0,0 +1,128 @@
+# backend/app/services/retraining.py
+import asyncio
+import logging
+import time
+from sqlalchemy import func, select, update
+from ..models.email_model import FeedbackSample
+
+logger = logging.getLogger(__name__)
+
+class RetrainingJob:
+    """Retrains the classifier from buffered feedback and hot-swaps the model"""
+
+    def __init__(self, classifier, executor, session_factory, min_samples=100,
+                 max_interval_seconds=3600, check_seconds=30, n_jobs=-1):
+        self.classifier = classifier
+        self.executor = executor
+        self.session_factory = session_factory
+        self.min_samples = min_samples
+        self.max_interval_seconds = max_interval_seconds
+        self.check_seconds = check_seconds
+        self.n_jobs = n_jobs
+        self.last_trained_at = time.monotonic()
+        self._offline_version_logged = None
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_seconds)
+            try:
+                # Pick up a model retrained by another API worker
+                if await asyncio.to_thread(self.classifier.reload_if_changed):
+                    await asyncio.to_thread(self.executor.restart)
+                await self.run_once()
+            except Exception:
+                logger.exception("Model retraining failed")
+
+    async def run_once(self, force=False):
+        """Retrain if enough feedback has accumulated or the interval has passed"""
+        # A model trained offline (scripts/train_model.py) was evaluated on a
+        # holdout and published by hand, so it must not be silently replaced;
+        # the next offline run picks up the feedback given since
+        manifest = self.classifier.manifest or {}
+        if manifest.get("training", {}).get("source") == "offline":
+            if self._offline_version_logged != manifest["version"]:
+                self._offline_version_logged = manifest["version"]
+                logger.info("Serving offline-trained model %s; feedback retraining is paused", manifest["version"])
+            return False
+
+        async with self.session_factory() as db:
+            pending = await db.scalar(
+                select(func.count()).select_from(FeedbackSample).where(FeedbackSample.used_in_training.is_(False))
+            )
+            overdue = time.monotonic() - self.last_trained_at >= self.max_interval_seconds
+            if not pending or not (force or pending >= self.min_samples or overdue):
+                return False
+
+            # Latest label per email wins when feedback was given more than once
+            result = await db.execute(
+                select(
+                    FeedbackSample.id,
+                    FeedbackSample.email_id,
+                    FeedbackSample.feature_names,
+                    FeedbackSample.features,
+                    FeedbackSample.is_fraud
+                )
+                .order_by(FeedbackSample.id)
+            )
+            samples = {}
+            max_id = 0
+            for sample_id, email_id, feature_names, features, is_fraud in result:
+                samples[email_id] = (feature_names, features, is_fraud)
+                max_id = sample_id
+
+        # Only rows extracted for the current feature list can be stacked; rows
+        # saved before feature names were recorded are kept if the length matches
+        current = list(self.classifier.features)
+        usable = [
+            (features, is_fraud)
+            for feature_names, features, is_fraud in samples.values()
+            if (feature_names == current if feature_names is not None else len(features) == len(current))
+        ]
+        if len(usable) < len(samples):
+            logger.info("Leaving out %d feedback samples extracted for another feature list", len(samples) - len(usable))
+
+        X = [features for features, _ in usable]
+        y = [1 if is_fraud else 0 for _, is_fraud in usable]
+        if len(set(y)) < 2:
+            logger.info("Skipping retraining until feedback covers both classes")
+            return False
+
+        start = time.perf_counter()
+        model = await asyncio.to_thread(self.classifier.fit_model, X, y, self.n_jobs)
+        metadata = {"source": "feedback", "samples": len(y), "fraud_samples": sum(y)}
+        # Saved as a new artifact version (for restarts and other workers) and swapped in
+        await asyncio.to_thread(self.classifier.publish_model, model, metadata)
+        self.last_trained_at = time.monotonic()
+
+        # Claimed only once the model is published, so a failed run leaves the
+        # samples pending for the next one. Two workers checking at the same
+        # time may both train; the later artifact wins
+        async with self.session_factory() as db:
+            await db.execute(
+                update(FeedbackSample)
+                .where(FeedbackSample.used_in_training.is_(False), FeedbackSample.id <= max_id)
+                .values(used_in_training=True)
+            )
+            await db.commit()
+
+        if self.classifier.model_path:
+            await asyncio.to_thread(self.executor.restart)
+        elif self.executor.backend == "process":
+            logger.warning("No MODEL_PATH set; process workers keep the previous model")
+
+        logger.info("Retrained model on %d emails in %.1fs", len(y), time.perf_counter() - start)
+        return True
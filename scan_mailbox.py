@@ -0,0 +1,250 @@
+# backend/scripts/scan_mailbox.py
+"""Scan mailbox exports offline and write one fraud verdict per message.
+
+Accepts mbox files, maildir directories and directories of .eml files (any
+mix, searched recursively). Messages are streamed, scored in chunks across
+worker processes and written as they complete, so memory stays flat no
+matter how large the archive is. Run from the backend directory:
+
+    python -m scripts.scan_mailbox export.mbox --output results.jsonl
+    python -m scripts.scan_mailbox ~/Maildir case-42/ --output results.csv --workers 8
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from config import settings
+
+CSV_FIELDS = [
+    "source", "message_id", "from", "subject", "date",
+    "fraud_probability", "is_fraud", "model_version", "indicators", "error"
+]
+
+MAILDIR_SUBDIRS = ("cur", "new")
+
+def iter_messages(paths):
+    """Yield (source, raw bytes) for every message under the given paths"""
+    for path in paths:
+        if os.path.isdir(path):
+            yield from _iter_directory(path)
+        elif _is_mbox(path):
+            yield from _iter_mbox(path)
+        else:
+            yield path, _read_file(path)
+
+def _iter_directory(path):
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        if os.path.basename(root) == "tmp" and _is_maildir(os.path.dirname(root)):
+            # Messages still being delivered
+            continue
+        in_maildir = os.path.basename(root) in MAILDIR_SUBDIRS and _is_maildir(os.path.dirname(root))
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            if in_maildir or name.lower().endswith(".eml"):
+                yield file_path, _read_file(file_path)
+            elif _is_mbox(file_path):
+                yield from _iter_mbox(file_path)
+
+def _is_maildir(path):
+    return all(os.path.isdir(os.path.join(path, subdir)) for subdir in ("cur", "new", "tmp"))
+
+def _is_mbox(path):
+    with open(path, "rb") as f:
+        return f.read(5) == b"From "
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def _iter_mbox(path):
+    """Split an mbox on "From " lines, holding only the current message in memory"""
+    # mailbox.mbox indexes the whole file before returning the first message
+    lines = []
+    offset = 0
+    start = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if line.startswith(b"From "):
+                if lines:
+                    yield f"{path}@{start}", _mbox_message(lines)
+                lines = []
+                start = offset
+            else:
+                lines.append(line)
+            offset += len(line)
+    if lines:
+        yield f"{path}@{start}", _mbox_message(lines)
+
+def _mbox_message(lines):
+    # The blank line before the next "From " separator isn't part of the message
+    if lines and lines[-1].strip() == b"":
+        lines = lines[:-1]
+    return b"".join(lines)
+
+def chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# Pipeline owned by each worker process, built once by _init_worker
+_processor = None
+_classifier = None
+
+def _init_worker(model_path):
+    global _processor, _classifier
+    from app.services.email_processor import get_processor
+    from app.services.ml_classifier import FraudClassifier
+    from app.services.tiered import build_scorer
+
+    _processor = get_processor()
+    _classifier = build_scorer(FraudClassifier(model_path, processor=_processor), _processor)
+
+def scan_chunk(messages):
+    """Score a chunk of (source, raw bytes) with one model call, returning result rows"""
+    rows = []
+    parsed_emails = []
+    for source, raw_email in messages:
+        try:
+            parsed_emails.append(_processor.parse_email(raw_email))
+            rows.append(_result_row(source, parsed_emails[-1]))
+        except Exception as e:
+            # One malformed message shouldn't lose the rest of the chunk
+            rows.append({"source": source, "error": f"{type(e).__name__}: {e}"})
+
+    try:
+        predictions = iter(_classifier.predict_batch(parsed_emails))
+    except Exception as e:
+        # Nor should a failed model call lose the rest of the mailbox
+        error = f"{type(e).__name__}: {e}"
+        for row in rows:
+            row.setdefault("error", error)
+        return rows
+    for row in rows:
+        if "error" not in row:
+            row.update(next(predictions))
+    return rows
+
+def _result_row(source, parsed_email):
+    headers = parsed_email["headers"]
+    return {
+        "source": source,
+        "message_id": str(headers["message_id"]),
+        "from": str(headers["from"]),
+        "subject": str(headers["subject"]),
+        "date": str(headers["date"])
+    }
+
+class ResultWriter:
+    """Writes result rows as JSON lines or CSV, flushing after every chunk"""
+
+    def __init__(self, stream, output_format):
+        self.stream = stream
+        self.output_format = output_format
+        if output_format == "csv":
+            self._csv = csv.DictWriter(stream, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            self._csv.writeheader()
+
+    def write(self, rows):
+        for row in rows:
+            if self.output_format == "csv":
+                self._csv.writerow(self._csv_row(row))
+            else:
+                self.stream.write(json.dumps(row) + "\n")
+        self.stream.flush()
+
+    def _csv_row(self, row):
+        indicators = row.get("indicators") or []
+        return {
+            **row,
+            "indicators": "; ".join(f"{i['type']} ({i['severity']})" for i in indicators)
+        }
+
+class Progress:
+    """Reports messages/sec to stderr at a fixed interval"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.last_report = self.started
+        self.messages = 0
+        self.errors = 0
+        self.flagged = 0
+
+    def update(self, rows):
+        self.messages += len(rows)
+        self.errors += sum(1 for row in rows if "error" in row)
+        self.flagged += sum(1 for row in rows if row.get("is_fraud"))
+        now = time.perf_counter()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report()
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.messages / elapsed if elapsed else 0.0
+        print(
+            f"{self.messages} messages, {self.flagged} flagged, {self.errors} errors, "
+            f"{rate:.1f} msg/s",
+            file=sys.stderr,
+            flush=True
+        )
+
+def scan(paths, writer, model_path, workers, chunk_size, progress):
+    chunks = chunked(iter_messages(paths), chunk_size)
+
+    if workers <= 1:
+        _init_worker(model_path)
+        for chunk in chunks:
+            rows = scan_chunk(chunk)
+            writer.write(rows)
+            progress.update(rows)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_path,)) as pool:
+        # A bounded window of chunks in flight keeps memory constant; results
+        # are written in submission order
+        in_flight = deque()
+        for chunk in chunks:
+            if len(in_flight) >= workers * 2:
+                rows = in_flight.popleft().result()
+                writer.write(rows)
+                progress.update(rows)
+            in_flight.append(pool.submit(scan_chunk, chunk))
+        while in_flight:
+            rows = in_flight.popleft().result()
+            writer.write(rows)
+            progress.update(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="mbox files, maildirs or directories of .eml files")
+    parser.add_argument("--output", default="-", help="Output file (default: stdout)")
+    parser.add_argument("--format", choices=("jsonl", "csv"), help="Defaults to the output file's extension, else jsonl")
+    parser.add_argument("--model-path", default=settings.MODEL_PATH)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=64, help="Messages per worker task and model call")
+    parser.add_argument("--progress-seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    output_format = args.format or ("csv" if args.output.lower().endswith(".csv") else "jsonl")
+    stream = sys.stdout if args.output == "-" else open(args.output, "w", newline="" if output_format == "csv" else None)
+    progress = Progress(args.progress_seconds)
+    try:
+        scan(args.paths, ResultWriter(stream, output_format), args.model_path, args.workers, args.chunk_size, progress)
+    finally:
+        progress.report()
+        if stream is not sys.stdout:
+            stream.close()
+
+if __name__ == "__main__":
+    main()
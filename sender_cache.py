@@ -0,0 +1,176 @@
+# backend/app/services/sender_cache.py
+import csv
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from sqlalchemy import and_, case, func, select
+from .domain_reputation import host_suffixes, normalize_host
+from .metrics import record_sender_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+# Features for a sender with no history and no known registration date
+NO_SENDER_FEATURES = {
+    "sender_history_days": 0.0,
+    "sender_fraud_rate": 0.0,
+    "sender_domain_age_days": -1
+}
+
+# From address of emails analyzed as pasted text, which have no real sender
+PLACEHOLDER_SENDER = "unknown@example.com"
+
+# (first seen, emails with confirmed verdicts, confirmed as fraud) for a domain never seen before
+_NO_HISTORY = (None, 0, 0)
+
+def load_domain_ages(path):
+    """Read registration dates from a CSV file of "domain,YYYY-MM-DD" rows (e.g. a WHOIS export)"""
+    created = {}
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or not row[0].strip() or row[0].lstrip().startswith("#"):
+                continue
+            try:
+                created[normalize_host(row[0])] = date.fromisoformat(row[1].strip()[:10])
+            except ValueError:
+                # Header row or a malformed date
+                continue
+    return created
+
+# Domains per history query, below the bound-parameter limit of every supported database
+HISTORY_QUERY_CHUNK = 500
+
+async def database_history(domains):
+    """{domain: (first seen, confirmed verdicts, confirmed fraud)} for the sender domains with stored emails"""
+    # Imported here so the processor can be built without a database configured
+    from ..database import create_async_session
+    from ..models.email_model import Email, FeedbackSample
+
+    # Only verdicts confirmed by feedback count; the others are the model's own
+    # predictions, which would feed back into its features
+    confirmed = Email.id.in_(select(FeedbackSample.email_id))
+    histories = {}
+    async with create_async_session() as db:
+        for i in range(0, len(domains), HISTORY_QUERY_CHUNK):
+            result = await db.execute(
+                select(
+                    Email.sender_domain,
+                    func.min(Email.analysis_date),
+                    func.sum(case((confirmed, 1), else_=0)),
+                    func.sum(case((and_(confirmed, Email.is_fraud), 1), else_=0))
+                )
+                .where(
+                    Email.sender_domain.in_(domains[i:i + HISTORY_QUERY_CHUNK]),
+                    Email.sender.is_distinct_from(PLACEHOLDER_SENDER)
+                )
+                .group_by(Email.sender_domain)
+            )
+            for domain, first_seen, labeled, flagged in result:
+                histories[domain] = (first_seen, labeled or 0, flagged or 0)
+    return histories
+
+class SenderDomainCache:
+    """Per-sender-domain features, with the history kept in a bounded LRU cache.
+
+    History (first seen, fraud rate among verdicts confirmed by feedback) is loaded asynchronously by prefetch,
+    from history_loader (by default one query on the emails table), before
+    the emails are scored; features never touches the database, so a domain
+    that was not prefetched scores as unseen. Registration dates come from a
+    local file. Entries expire after ttl_seconds so the history follows new
+    analyses.
+    """
+
+    def __init__(self, history_loader=database_history, domain_ages=None, max_size=100_000, ttl_seconds=3600):
+        self.history_loader = history_loader
+        self.domain_ages = domain_ages or {}
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.load_errors = 0
+        self._entries = OrderedDict()  # domain -> (expires_at, history)
+        self._lock = threading.Lock()
+
+    async def prefetch(self, domains):
+        """Load the history of the domains not cached (or expired) with one query"""
+        if self.history_loader is None:
+            return
+
+        now = time.monotonic()
+        missing = set()
+        with self._lock:
+            for domain in set(filter(None, domains)):
+                entry = self._entries.get(domain)
+                if entry is None or entry[0] < now:
+                    missing.add(domain)
+                    self.misses += 1
+                    record_sender_cache_lookup(False)
+                else:
+                    self._entries.move_to_end(domain)
+                    self.hits += 1
+                    record_sender_cache_lookup(True)
+        if not missing:
+            return
+
+        # Loaded outside the lock; concurrent requests missing on the same
+        # domain both query, which is cheaper than serializing every miss
+        try:
+            histories = await self.history_loader(sorted(missing))
+        except Exception:
+            # Cached like unknown senders, so a database outage costs one query per domain per TTL
+            histories = {}
+            self.load_errors += 1
+            if self.load_errors == 1:
+                logger.exception("Could not load sender history; treating senders as unseen")
+
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            for domain in missing:
+                self._entries[domain] = (expires_at, histories.get(domain, _NO_HISTORY))
+                self._entries.move_to_end(domain)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def features(self, domain, with_history=True):
+        """Sender features for a domain from the prefetched history and the registration dates"""
+        if not domain:
+            return dict(NO_SENDER_FEATURES)
+
+        entry = None
+        if with_history:
+            with self._lock:
+                entry = self._entries.get(domain)
+        first_seen, labeled, flagged = entry[1] if entry is not None else _NO_HISTORY
+        created = self._created(domain)
+
+        now = datetime.now()
+        return {
+            "sender_history_days": (now - first_seen).total_seconds() / 86400 if first_seen else 0.0,
+            "sender_fraud_rate": flagged / labeled if labeled else 0.0,
+            "sender_domain_age_days": (now.date() - created).days if created else -1
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "load_errors": self.load_errors,
+            "known_domain_ages": len(self.domain_ages)
+        }
+
+    def _created(self, domain):
+        # Registration dates are kept for registered domains, so walk up from the host
+        for suffix in host_suffixes(domain):
+            created = self.domain_ages.get(suffix)
+            if created is not None:
+                return created
+        return None
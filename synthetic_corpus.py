@@ -0,0 +1,145 @@
+# backend/benchmarks/synthetic_corpus.py
+"""Deterministic synthetic emails for benchmarks.
+
+The same seed always produces byte-identical messages, so timings from
+different runs (and machines) are measured on the same input.
+"""
+import random
+from email.message import EmailMessage
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+KINDS = ("plain", "html", "many_links", "huge_body", "multipart")
+
+LEGIT_WORDS = (
+    "meeting", "agenda", "project", "report", "quarter", "team", "review", "schedule",
+    "lunch", "thanks", "attached", "notes", "draft", "budget", "design", "release",
+    "customer", "feedback", "weekly", "planning", "the", "and", "for", "with", "our",
+    "please", "see", "next", "week", "let", "me", "know", "if", "you", "have", "questions"
+)
+
+PHISHING_WORDS = (
+    "urgent", "verify", "account", "suspended", "login", "click", "bank", "password",
+    "security", "alert", "unauthorized", "payment", "expires", "immediately", "confirm",
+    "update", "information", "act now", "limited time", "deadline", "warning"
+)
+
+LEGIT_DOMAINS = ("example.com", "docs.example.org", "intranet.example.net", "news.example.com")
+PHISHING_DOMAINS = (
+    "secure-login.example-bank.co", "account-update.payments.io", "bit.ly", "tinyurl.com",
+    "192.168.14.7", "verification-center.net", "billing-update.support"
+)
+
+START_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+# With auth_results, the share of phishing emails that forge a legitimate From (and fail DMARC)
+SPOOFED_SHARE = 0.3
+
+class CorpusGenerator:
+    """Builds raw RFC 822 emails of each kind from a seeded random source"""
+
+    def __init__(self, seed=0, huge_body_chars=500_000, auth_results=False):
+        self.rng = random.Random(seed)
+        self.huge_body_chars = huge_body_chars
+        # Off by default so existing corpora (and benchmark baselines) stay byte-identical
+        self.auth_results = auth_results
+        self.count = 0
+
+    def generate(self, count):
+        """Return count (kind, is_phishing, raw bytes) tuples, cycling through the kinds"""
+        return [self.message(KINDS[i % len(KINDS)]) for i in range(count)]
+
+    def message(self, kind):
+        is_phishing = self.rng.random() < 0.5
+        build = getattr(self, f"_{kind}")
+        msg = build(is_phishing)
+        self._add_headers(msg, is_phishing)
+        # The email package picks random MIME boundaries otherwise
+        for number, part in enumerate(part for part in msg.walk() if part.is_multipart()):
+            part.set_boundary(f"bench-{self.count}-{number}")
+        self.count += 1
+        return kind, is_phishing, bytes(msg)
+
+    def _add_headers(self, msg, is_phishing):
+        domain = self.rng.choice(PHISHING_DOMAINS if is_phishing else LEGIT_DOMAINS)
+        if self.auth_results:
+            if is_phishing and self.rng.random() < SPOOFED_SHARE:
+                domain = self.rng.choice(LEGIT_DOMAINS)
+                results = "spf=fail; dkim=none; dmarc=fail"
+            else:
+                results = "spf=pass; dkim=pass; dmarc=pass"
+            msg["Authentication-Results"] = f"mx.example.com; {results} header.from={domain}"
+        msg["From"] = f"sender{self.count}@{domain}"
+        msg["To"] = "user@example.com"
+        msg["Subject"] = self._sentence(is_phishing, 6).capitalize()
+        msg["Date"] = format_datetime(START_DATE + timedelta(minutes=self.count))
+        msg["Message-ID"] = f"<bench-{self.count}@example.com>"
+
+    def _sentence(self, is_phishing, words):
+        vocabulary = LEGIT_WORDS + PHISHING_WORDS if is_phishing else LEGIT_WORDS
+        sentence = " ".join(self.rng.choice(vocabulary) for _ in range(words))
+        if is_phishing and self.rng.random() < 0.3:
+            sentence = sentence.upper() + "!!"
+        return sentence
+
+    def _paragraphs(self, is_phishing, count):
+        return "\n\n".join(
+            ". ".join(self._sentence(is_phishing, self.rng.randint(6, 14)).capitalize() for _ in range(4)) + "."
+            for _ in range(count)
+        )
+
+    def _url(self, is_phishing):
+        domain = self.rng.choice(PHISHING_DOMAINS if is_phishing and self.rng.random() < 0.7 else LEGIT_DOMAINS)
+        return f"http://{domain}/{self.rng.choice(LEGIT_WORDS)}/{self.rng.randint(1, 99999)}"
+
+    def _html_body(self, is_phishing, paragraphs, links):
+        rows = "".join(
+            f"<tr><td style=\"padding:4px;color:#333\">{self._sentence(is_phishing, 5)}</td>"
+            f"<td><a href=\"{self._url(is_phishing)}\">{self._sentence(is_phishing, 2)}</a></td></tr>"
+            for _ in range(links)
+        )
+        text = "".join(f"<p>{paragraph}</p>" for paragraph in self._paragraphs(is_phishing, paragraphs).split("\n\n"))
+        return (
+            "<html><head><style>td {font-family: Arial}</style></head><body>"
+            f"<div class=\"content\">{text}</div><table>{rows}</table></body></html>"
+        )
+
+    def _plain(self, is_phishing):
+        msg = EmailMessage()
+        msg.set_content(self._paragraphs(is_phishing, 3) + f"\n\n{self._url(is_phishing)}\n")
+        return msg
+
+    def _html(self, is_phishing):
+        msg = EmailMessage()
+        msg.set_content(self._html_body(is_phishing, paragraphs=8, links=20), subtype="html")
+        return msg
+
+    def _many_links(self, is_phishing):
+        msg = EmailMessage()
+        links = "\n".join(self._url(is_phishing) for _ in range(200))
+        anchors = "".join(f"<a href=\"{self._url(is_phishing)}\">link</a> " for _ in range(200))
+        msg.set_content(f"<html><body><p>{self._sentence(is_phishing, 12)}</p>{anchors}<pre>{links}</pre></body></html>", subtype="html")
+        return msg
+
+    def _huge_body(self, is_phishing):
+        msg = EmailMessage()
+        parts = []
+        size = 0
+        while size < self.huge_body_chars:
+            paragraph = self._paragraphs(is_phishing, 1)
+            parts.append(paragraph)
+            size += len(paragraph) + 2
+        msg.set_content("\n\n".join(parts))
+        return msg
+
+    def _multipart(self, is_phishing):
+        msg = EmailMessage()
+        msg.set_content(self._paragraphs(is_phishing, 2))
+        msg.add_alternative(self._html_body(is_phishing, paragraphs=2, links=5), subtype="html")
+        attachment = bytes(self.rng.getrandbits(8) for _ in range(20_000))
+        msg.add_attachment(attachment, maintype="application", subtype="pdf", filename="invoice.pdf")
+        return msg
+
+def generate_corpus(count, seed=0, huge_body_chars=500_000, auth_results=False):
+    """Return count (kind, is_phishing, raw bytes) tuples, identical for the same arguments"""
+    return CorpusGenerator(seed, huge_body_chars, auth_results).generate(count)
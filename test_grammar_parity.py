@@ -0,0 +1,57 @@
+# backend/tests/test_grammar_parity.py
+"""The regex grammar mode must count all-caps words like spaCy's tokenizer.
+
+Degraded mode switches to the regex count without notice, so these
+cases pin it to the tokenizer on text that has split them before.
+"""
+import pytest
+
+spacy = pytest.importorskip("spacy")
+
+from app.services.email_processor import _count_caps_words
+
+CASES = [
+    "Call 1-800-FREE-NOW",
+    "1-800-FREE",
+    "FREE-NOW-1",
+    "NOW-FREE-1",
+    "FREE--NOW and WIN---BIG",
+    "WIN——BIG or LOSE~ALL",
+    "ACT NOW!!! Claim your PRIZE.",
+    "VERIFY,CONFIRM,PAY",
+    "12,FREE and FREE,12",
+    "URGENT:ACT or 1:FREE",
+    "ABC-123 and A-B",
+    "US-based e-MAIL (FREE-NOW)",
+    "PAYPAL's ACCOUNT'S SUSPENDED",
+    "Visit www.free-prize.com or https://example.com/FREE-NOW",
+    "HTTPS://EXAMPLE.COM and WWW.PRIZE.COM",
+    "Write to SUPPORT@BANK.COM today",
+    "end.NEXT and WAIT...WHAT",
+    "“QUOTED” [BRACKETED] {BRACED}",
+    "I AM OK",
+]
+
+# Known gap: spaCy's URL match fails on some all-caps URLs, which are then
+# split on infixes, while the regex mode keeps every URL-like chunk whole
+KNOWN_GAPS = [
+    "Visit WWW.BANK.COM/VERIFY-NOW",
+    "https://EXAMPLE.COM/FREE-NOW",
+]
+
+@pytest.fixture(scope="module")
+def tokenizer():
+    # The blank English pipeline has the same tokenizer as en_core_web_sm
+    return spacy.blank("en").tokenizer
+
+def _tokenizer_count(tokenizer, text):
+    return sum(1 for token in tokenizer(text) if token.is_alpha and token.text.isupper() and len(token.text) > 1)
+
+@pytest.mark.parametrize("text", CASES)
+def test_regex_count_matches_tokenizer(tokenizer, text):
+    assert _count_caps_words(text) == _tokenizer_count(tokenizer, text)
+
+@pytest.mark.xfail(strict=True, reason="all-caps URLs are split by spaCy but kept whole by the regex mode")
+@pytest.mark.parametrize("text", KNOWN_GAPS)
+def test_known_gaps(tokenizer, text):
+    assert _count_caps_words(text) == _tokenizer_count(tokenizer, text)
@@ -0,0 +1,87 @@
+# backend/app/services/tiered.py
+from .email_processor import parse_authentication_results
+from .metrics import timed
+from config import settings
+
+# Tiers in the order they are tried; the first one with a verdict decides
+TIERS = ("link_reputation", "sender_allowlist", "model")
+
+class TieredScorer:
+    """Scores emails with cheap header and link rules first, running NLP features
+    and the model only for emails the rules leave ambiguous.
+
+    Has the classifier's predict/predict_batch interface, so it can be used
+    wherever a FraudClassifier is. Every prediction says which tier decided it.
+    """
+
+    def __init__(self, classifier, processor):
+        self.classifier = classifier
+        self.processor = processor
+
+    def predict(self, parsed_email):
+        prediction = self._rule_verdict(parsed_email)
+        if prediction is None:
+            prediction = {**self.classifier.predict(parsed_email), "decided_by": "model"}
+        return prediction
+
+    def predict_batch(self, parsed_emails):
+        predictions = [self._rule_verdict(parsed_email) for parsed_email in parsed_emails]
+
+        # One model call for whatever the rules didn't decide
+        undecided = [i for i, prediction in enumerate(predictions) if prediction is None]
+        if undecided:
+            model_predictions = self.classifier.predict_batch([parsed_emails[i] for i in undecided])
+            for i, prediction in zip(undecided, model_predictions):
+                predictions[i] = {**prediction, "decided_by": "model"}
+        return predictions
+
+    def feature_row(self, parsed_email):
+        return self.classifier.feature_row(parsed_email)
+
+    def _rule_verdict(self, parsed_email):
+        """A prediction from the cheap tiers, or None if the email needs the model"""
+        with timed("tier_rules"):
+            reputation = self.processor.reputation
+            links = parsed_email["links"]
+            flags = [reputation.link_flags(link) for link in links]
+
+            # Links straight to an IP address or a domain on a blocklist. Built-in
+            # pattern hits ("verification", ...) also occur in legitimate hosts,
+            # so they are left to the model, which sees them as link features
+            high_risk = sum(1 for is_ip, is_listed, _, _ in flags if is_ip or is_listed)
+            if high_risk:
+                return self._prediction(True, "link_reputation", [{
+                    "type": "suspicious_links",
+                    "description": f"Links to an IP address or blocklisted domain ({high_risk} out of {len(links)})",
+                    "severity": 10
+                }])
+
+            # Trusted sender, as long as nothing about the links is suspicious. The
+            # From domain is only trusted when DMARC passed, since it is trivially forged
+            if (
+                not any(matches_pattern or is_shortener for _, _, matches_pattern, is_shortener in flags)
+                and reputation.is_allowlisted(parsed_email["sender_domain"])
+                and _dmarc_passed(parsed_email)
+            ):
+                return self._prediction(False, "sender_allowlist", [])
+
+        return None
+
+    def _prediction(self, is_fraud, decided_by, indicators):
+        return {
+            'fraud_probability': 1.0 if is_fraud else 0.0,
+            'is_fraud': is_fraud,
+            'indicators': indicators,
+            'model_version': self.classifier.version,
+            'decided_by': decided_by
+        }
+
+def _dmarc_passed(parsed_email):
+    auth_results = parse_authentication_results(parsed_email["headers"].get("authentication_results", []))
+    return auth_results.get("dmarc") == "pass"
+
+def build_scorer(classifier, processor):
+    """The classifier, behind the rule tiers when TIERED_SCORING_ENABLED is set"""
+    if settings.TIERED_SCORING_ENABLED:
+        return TieredScorer(classifier, processor)
+    return classifier
@@ -0,0 +1,259 @@
+# backend/scripts/train_model.py
+"""Train the fraud model offline on labeled emails from the database.
+
+Rows are streamed from the emails table with a server-side cursor and
+their features extracted across worker processes. Feature rows are cached
+by email id in --cache-dir, so a re-run only extracts features for emails
+added since; labels are always re-read, so feedback given since the last
+run is used. The fitted forest is written as a new versioned artifact,
+which running API workers pick up on their next model check (their
+background retraining then leaves it alone). Run from the backend
+directory:
+
+    python -m scripts.train_model
+    python -m scripts.train_model --model-path model/fraud_model.joblib
+
+Only emails whose verdict was confirmed by feedback are used by default.
+The stored verdict of any other email is the model's own past prediction,
+so --all-labels trains the model on its own output; use it only when the
+emails table holds labels from elsewhere (e.g. an imported labeled corpus).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sklearn.metrics import precision_score, recall_score, roc_auc_score
+from sklearn.model_selection import train_test_split
+from sqlalchemy import select
+from app.database import create_session
+from app.models.email_model import Email, FeedbackSample
+from app.services.analyzer import build_stored_raw_email, stored_sender_features
+from app.services.ml_classifier import DEFAULT_THRESHOLD, FEATURES, FraudClassifier
+from app.services.model_store import save_artifact
+from config import settings
+
+# Bumped when cached rows must be extracted again for the same feature list
+# (2: authentication results are rebuilt from the stored headers;
+# 3: sender features are the ones saved at analysis time)
+FEATURE_CACHE_VERSION = 3
+
+# Pipeline owned by each worker process, built once by _init_worker
+_processor = None
+
+def _init_worker():
+    global _processor
+    from app.services.email_processor import get_processor
+
+    # Sender history is not queried here: read now, it would count each email's
+    # own label. Emails use the sender features saved when they were analyzed,
+    # as feedback samples do, or the domain age alone when none were saved
+    _processor = get_processor()
+
+def feature_chunk(rows):
+    """Feature rows for a chunk of (id, sender, subject, body, authentication_results, sender_features),
+    NaN where extraction failed"""
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    X = np.full((len(rows), len(FEATURES)), np.nan)
+    for i, (_, sender, subject, body, authentication_results, sender_features) in enumerate(rows):
+        try:
+            parsed_email = _processor.parse_email(
+                build_stored_raw_email(sender, subject, body or "", authentication_results)
+            )
+            parsed_email["sender_features"] = stored_sender_features(_processor, sender_features, parsed_email)
+            features = _processor.extract_features(parsed_email)
+            X[i] = [float(features[name]) for name in FEATURES]
+        except Exception as e:
+            # Cached as NaN so a bad row is skipped, not retried on every run
+            print(f"Email {ids[i]}: {type(e).__name__}: {e}", file=sys.stderr)
+    return ids, X
+
+class FeatureCache:
+    """Feature rows by email id, as .npy files in a directory"""
+
+    def __init__(self, directory, features):
+        self.directory = directory
+        self.features = list(features)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.X = np.zeros((0, len(self.features)))
+
+    def load(self):
+        meta_path = os.path.join(self.directory, "meta.json")
+        if not os.path.exists(meta_path):
+            return self
+        with open(meta_path) as f:
+            meta = json.load(f)
+        # Rows extracted for another feature list or cache version can't be reused
+        if meta["features"] != self.features or meta.get("version") != FEATURE_CACHE_VERSION:
+            print("Feature list changed; extracting features for every email again", file=sys.stderr)
+            return self
+        self.ids = np.load(os.path.join(self.directory, "ids.npy"))
+        self.X = np.load(os.path.join(self.directory, "features.npy"))
+        return self
+
+    def add(self, ids, X):
+        self.ids = np.concatenate([self.ids, ids])
+        self.X = np.concatenate([self.X, X])
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        # Sorted by id so labels can be matched up with searchsorted
+        order = np.argsort(self.ids, kind="stable")
+        self.ids, self.X = self.ids[order], self.X[order]
+        for name, array in (("ids", self.ids), ("features", self.X)):
+            tmp_path = os.path.join(self.directory, f"{name}.tmp.npy")
+            np.save(tmp_path, array)
+            os.replace(tmp_path, os.path.join(self.directory, f"{name}.npy"))
+        with open(os.path.join(self.directory, "meta.json"), "w") as f:
+            json.dump({"version": FEATURE_CACHE_VERSION, "features": self.features, "rows": len(self.ids)}, f)
+
+    @property
+    def max_id(self):
+        return int(self.ids.max()) if len(self.ids) else 0
+
+def _labeled(statement, feedback_only):
+    statement = statement.where(Email.analyzed.is_(True), Email.is_fraud.is_not(None))
+    if feedback_only:
+        statement = statement.where(Email.id.in_(select(FeedbackSample.email_id)))
+    return statement
+
+def load_labels(db, feedback_only, chunk_size):
+    """(ids, labels) of every labeled email, in id order"""
+    result = db.execute(
+        _labeled(select(Email.id, Email.is_fraud), feedback_only)
+        .order_by(Email.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    ids, labels = [], []
+    for partition in result.partitions():
+        for email_id, is_fraud in partition:
+            ids.append(email_id)
+            labels.append(1 if is_fraud else 0)
+    return np.array(ids, dtype=np.int64), np.array(labels, dtype=np.int64)
+
+def extract_new_features(db, cache, workers, chunk_size):
+    """Extract features for labeled emails newer than the cache into it, returning how many"""
+    # Every labeled email is cached, so feedback given later on an older email finds its row
+    result = db.execute(
+        _labeled(select(
+            Email.id, Email.sender, Email.subject, Email.body, Email.authentication_results, Email.sender_features
+        ), False)
+        .where(Email.id > cache.max_id)
+        .order_by(Email.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    chunks = ([tuple(row) for row in partition] for partition in result.partitions())
+
+    new_ids, new_X = [], []
+    started = time.perf_counter()
+
+    def collect(ids, X):
+        new_ids.append(ids)
+        new_X.append(X)
+        extracted = sum(len(ids) for ids in new_ids)
+        print(f"{extracted} emails, {extracted / (time.perf_counter() - started):.1f} emails/s", file=sys.stderr, flush=True)
+
+    if workers <= 1:
+        _init_worker()
+        for chunk in chunks:
+            collect(*feature_chunk(chunk))
+    else:
+        _extract_parallel(chunks, collect, workers)
+
+    if new_ids:
+        cache.add(np.concatenate(new_ids), np.concatenate(new_X))
+    return sum(len(ids) for ids in new_ids)
+
+def _extract_parallel(chunks, collect, workers):
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        # A bounded window of chunks in flight keeps memory flat while the cursor streams
+        in_flight = deque()
+        for chunk in chunks:
+            if len(in_flight) >= workers * 2:
+                collect(*in_flight.popleft().result())
+            in_flight.append(pool.submit(feature_chunk, chunk))
+        while in_flight:
+            collect(*in_flight.popleft().result())
+
+def training_set(cache, label_ids, labels):
+    """Cached feature rows matched up with the current labels"""
+    positions = np.searchsorted(cache.ids, label_ids)
+    positions = np.minimum(positions, max(len(cache.ids) - 1, 0))
+    found = (cache.ids[positions] == label_ids) if len(cache.ids) else np.zeros(len(label_ids), dtype=bool)
+    X, y = cache.X[positions[found]], labels[found]
+    usable = ~np.isnan(X).any(axis=1)
+    return X[usable], y[usable]
+
+def evaluate(model, X, y, threshold):
+    probabilities = model.predict_proba(X)[:, 1]
+    predicted = (probabilities > threshold).astype(int)
+    return {
+        "samples": len(y),
+        "precision": round(float(precision_score(y, predicted, zero_division=0)), 4),
+        "recall": round(float(recall_score(y, predicted, zero_division=0)), 4),
+        "roc_auc": round(float(roc_auc_score(y, probabilities)), 4)
+    }
+
+def train(model_path, cache_dir, feedback_only, workers, chunk_size, test_size, threshold):
+    cache = FeatureCache(cache_dir, FEATURES).load()
+    with create_session() as db:
+        extracted = extract_new_features(db, cache, workers, chunk_size)
+        if extracted:
+            cache.save()
+        label_ids, labels = load_labels(db, feedback_only, chunk_size)
+
+    X, y = training_set(cache, label_ids, labels)
+    if len(np.unique(y)) < 2:
+        raise SystemExit(f"Need both fraud and legitimate emails to train, found {len(y)} labeled rows")
+
+    holdout = None
+    if test_size:
+        X, X_test, y, y_test = train_test_split(X, y, test_size=test_size, stratify=y, random_state=42)
+
+    start = time.perf_counter()
+    # Same estimator settings as the served model, fitted on every core
+    model = FraudClassifier(allow_untrained=True).fit_model(X, y, n_jobs=-1)
+    fit_seconds = time.perf_counter() - start
+    if test_size:
+        holdout = evaluate(model, X_test, y_test, threshold)
+
+    metadata = {
+        "source": "offline",
+        "samples": len(y),
+        "fraud_samples": int(y.sum()),
+        "feedback_only": feedback_only,
+        "holdout": holdout
+    }
+    manifest = save_artifact(model, model_path, FEATURES, threshold, metadata)
+    return {
+        "version": manifest["version"],
+        "model_path": model_path,
+        "extracted": extracted,
+        "cached_rows": len(cache.ids),
+        "fit_seconds": round(fit_seconds, 1),
+        **metadata
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-path", default=settings.MODEL_PATH)
+    parser.add_argument("--cache-dir", default="model/feature_cache", help="Where extracted feature rows are kept between runs")
+    parser.add_argument("--all-labels", action="store_true",
+                        help="Also train on emails without feedback, labeled by their stored (predicted) verdict")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=500, help="Rows per database fetch and worker task")
+    parser.add_argument("--test-size", type=float, default=0.2, help="Share of rows held out for evaluation (0 to train on all)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    if not args.model_path:
+        raise SystemExit("No --model-path given and MODEL_PATH is not set")
+    result = train(args.model_path, args.cache_dir, not args.all_labels, args.workers,
+                   args.chunk_size, args.test_size, args.threshold)
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
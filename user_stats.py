@@ -0,0 +1,93 @@
+# backend/app/services/user_stats.py
+from collections import Counter
+from datetime import date, datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from ..models.email_model import UserDailyStat
+
+# Fraud scores are counted in ten 0.1-wide buckets
+SCORE_BUCKETS = 10
+
+_DIALECT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert
+}
+
+def record_stat_rows(records):
+    """Counter increments for a batch of (email_row, indicator_rows) analysis records"""
+    counts = Counter()
+    for email_row, indicator_rows in records:
+        key = (email_row["user_id"], email_row["analysis_date"].date())
+        counts[key + ("analyzed",)] += 1
+        if email_row["is_fraud"]:
+            counts[key + ("fraud",)] += 1
+        bucket = min(int(email_row["fraud_score"] * SCORE_BUCKETS), SCORE_BUCKETS - 1)
+        counts[key + (f"score:{bucket}",)] += 1
+        for indicator_row in indicator_rows:
+            counts[key + (f"indicator:{indicator_row['indicator_type']}",)] += 1
+    return _rows(counts)
+
+def feedback_stat_rows(email, was_fraud, is_fraud):
+    """Counter changes for user feedback on an analyzed email"""
+    counts = Counter()
+    day = (email.analysis_date or datetime.now()).date()
+    counts[(email.user_id, day, "feedback")] += 1
+    # The verdict is counted on the day it was analyzed, so move it there
+    if bool(was_fraud) != bool(is_fraud):
+        counts[(email.user_id, day, "fraud")] += 1 if is_fraud else -1
+    return _rows(counts)
+
+def _rows(counts):
+    # Sorted so concurrent transactions lock the counter rows in the same order
+    return [
+        {"user_id": user_id, "day": day, "metric": metric, "count": count}
+        for (user_id, day, metric), count in sorted(counts.items())
+        if user_id is not None
+    ]
+
+def upsert_stats_statement(dialect_name):
+    """INSERT ... ON CONFLICT that adds to existing counters atomically"""
+    try:
+        dialect_insert = _DIALECT_INSERTS[dialect_name]
+    except KeyError:
+        raise NotImplementedError(f"User stats are not supported on {dialect_name}")
+
+    statement = dialect_insert(UserDailyStat)
+    return statement.on_conflict_do_update(
+        index_elements=[UserDailyStat.user_id, UserDailyStat.day, UserDailyStat.metric],
+        set_={"count": UserDailyStat.count + statement.excluded.count}
+    )
+
+async def load_user_stats(db, user_id, days):
+    """Totals, score histogram, indicator counts and daily series for the last days days"""
+    since = date.today() - timedelta(days=days - 1)
+    result = await db.execute(
+        select(UserDailyStat.day, UserDailyStat.metric, UserDailyStat.count)
+        .where(UserDailyStat.user_id == user_id, UserDailyStat.day >= since)
+        .order_by(UserDailyStat.day)
+    )
+
+    totals = Counter()
+    score_histogram = [0] * SCORE_BUCKETS
+    indicators = Counter()
+    daily = {}
+    for day, metric, count in result:
+        totals[metric] += count
+        if metric.startswith("score:"):
+            score_histogram[int(metric[len("score:"):])] += count
+        elif metric.startswith("indicator:"):
+            indicators[metric[len("indicator:"):]] += count
+        elif metric in ("analyzed", "fraud"):
+            daily.setdefault(day, {"day": day.isoformat(), "analyzed": 0, "fraud": 0})[metric] += count
+
+    return {
+        "user_id": user_id,
+        "since": since.isoformat(),
+        "total_analyzed": totals["analyzed"],
+        "fraud_count": totals["fraud"],
+        "fraud_rate": totals["fraud"] / totals["analyzed"] if totals["analyzed"] else 0.0,
+        "feedback_count": totals["feedback"],
+        "score_histogram": score_histogram,
+        "indicator_counts": dict(indicators.most_common()),
+        "daily": list(daily.values())
+    }